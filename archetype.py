@@ -0,0 +1,99 @@
+"""
+敌人原型
+
+每种敌人在 assets/enemies.json 中声明一次：
+
+    velocity        初始 (速度, 方向)
+    position        初始 (x, y)
+    acceleration    (加速度, 方向)，省略时没有加速度组件
+    size            (宽, 高)，默认 (32, 64)
+    health          生命值
+    shooter         { "pattern": 弹幕模式（见 pattern.py）, "speed", "interval", "size" }
+    sprite          图片，经过 assets 缓存，省略时使用 EnemyRenderSys 的默认图片
+    params          生成时的参数，按顺序对应 spawn(*args)：
+                    { "name", "x": 步长, "y": 步长 } 位置加上 参数 * 步长
+                    { "name", "field": "health" } 参数替换该字段
+                    没有 x / y / field 的参数不影响敌人
+
+spawn() 与 spawnMany() 在一次 Component.components.batch() 中生成全部组件，
+删除与其他实体相同，destroy() 之后帧末批量删除。
+"""
+
+import os
+import json
+
+from assets import assets
+from components import Component
+from entities import Enemy
+from pattern import compilePattern
+
+ARCHETYPE_PATH = os.path.join('assets', 'enemies.json')
+
+class Archetype:
+
+    def __init__(self, name, data) -> None:
+        self.name = name
+        self.velocity = tuple(data['velocity'])
+        self.position = tuple(data['position'])
+        self.acceleration = tuple(data['acceleration']) if 'acceleration' in data else None
+        self.size = tuple(data.get('size', (32, 64)))
+        self.health = data['health']
+        shooter = dict(data['shooter'])
+        # 同一原型的敌人共享编译后的程序
+        self.pattern = compilePattern(shooter.pop('pattern'))
+        self.shooterParams = shooter
+        self.sprite = data.get('sprite')
+        self.params = data.get('params', [])
+
+    def __repr__(self) -> str:
+        return 'Archetype(%s)' % self.name
+
+    @property
+    def image(self):
+        # 所有同类敌人共享缓存中的同一张图片
+        if self.sprite is None:
+            return None
+        return assets.image(self.sprite)
+
+    def resolve(self, args):
+        # 按参数计算 (x, y, 生命值)
+        if len(args) > len(self.params):
+            raise TypeError('%s 最多接受 %d 个参数' % (self.name, len(self.params)))
+        x, y = self.position
+        health = self.health
+        for param, value in zip(self.params, args):
+            if 'x' in param:
+                x = x + value * param['x']
+            if 'y' in param:
+                y = y + value * param['y']
+            if param.get('field') == 'health':
+                health = value
+        return x, y, health
+
+    def spawn(self, *args):
+        with Component.components.batch():
+            return Enemy(self, *self.resolve(args))
+
+    def spawnMany(self, argsList):
+        # 一次生成多个，argsList 为每个敌人的参数
+        with Component.components.batch():
+            return [ Enemy(self, *self.resolve(args)) for args in argsList ]
+
+    __call__ = spawn
+
+# 名字 -> Archetype
+archetypes = {}
+
+def loadArchetypes(path=ARCHETYPE_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    archetypes.update({ name: Archetype(name, entry) for name, entry in data.items() })
+    return archetypes
+
+def archetype(name):
+    if not archetypes:
+        loadArchetypes()
+    found = archetypes.get(name)
+    if found is None:
+        raise ValueError('未知的敌人：%s' % name)
+    return found
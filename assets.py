@@ -0,0 +1,206 @@
+"""
+图片资源缓存
+
+进程内唯一的 AssetCache，按 (路径, 裁剪矩形) 缓存解码后的 QImage / QPixmap，所有使用者共享同一个实例。
+QImage 与 QPixmap 是隐式共享的，绘制只读取，修改时 Qt 会复制一份，因此共享是安全的。
+
+存在 atlas.bundle 时优先从图集中取图片（见 atlas.py），这些图片指向映射的文件，不解码也不占用缓存的字节数。
+缓存记录解码后的字节数，超过 budget 时按最近最少使用的顺序淘汰。
+被淘汰的图片如果仍被组件引用，内存不会立即释放，下次请求时重新解码。
+hits / misses / evictions 用于观察缓存效果。
+
+preload() 在后台线程中解码之后需要的图片（例如标题界面显示时解码关卡的图片），
+返回的 Preload 提供进度与完成的 Future，切换关卡时只需要等待还没有完成的部分。
+QImage 可以在任意线程中解码，QPixmap 只能在 GUI 线程创建，因此只预先加载 QImage。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore, QtGui
+
+from gui import gui
+import atlas
+
+# 默认 64 MiB
+BUDGET = 64 * 2 ** 20
+
+class AssetCache:
+
+    def __init__(self, budget=BUDGET, bundlePath=atlas.PATH) -> None:
+        self.budget = budget
+        self.bundlePath = bundlePath
+        # 首次取图片时打开，None 表示还没有打开，False 表示没有图集
+        self._bundle = None
+        # (种类, 路径, 裁剪矩形) -> (图片, 字节数)，按最近使用的顺序排列
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 预先加载的线程与 GUI 线程同时访问 entries
+        self.lock = threading.RLock()
+        self.executor = None
+
+    @staticmethod
+    def key(kind, path, rect):
+        # 路径统一为规范形式，矩形转为元组
+        path = os.path.normpath(path)
+        if isinstance(rect, (QtCore.QRect, QtCore.QRectF)):
+            rect = (rect.x(), rect.y(), rect.width(), rect.height())
+        return (kind, path, None if rect is None else tuple(int(v) for v in rect))
+
+    @staticmethod
+    def size(image):
+        if isinstance(image, QtGui.QPixmap):
+            return image.width() * image.height() * max(image.depth(), 8) // 8
+        return image.sizeInBytes()
+
+    @property
+    def bundle(self):
+        with self.lock:
+            if self._bundle is None:
+                self._bundle = (self.bundlePath is not None and atlas.load(self.bundlePath)) or False
+            return self._bundle or None
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, image, size=None):
+        with self.lock:
+            # 另一个线程已经放入时使用已有的图片
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            if size is None:
+                size = self.size(image)
+            self.entries[key] = (image, size)
+            self.bytes += size
+            self.evict()
+            return image
+
+    def evict(self):
+        # 至少保留最近放入的一项
+        while self.bytes > self.budget and len(self.entries) > 1:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def image(self, path, rect=None) -> QtGui.QImage:
+        key = self.key('image', path, rect)
+        image = self.get(key)
+        if image is not None:
+            return image
+        bundle = self.bundle
+        if bundle is not None and path in bundle:
+            return self.put(key, bundle.image(path, key[2]), 0)
+        if rect is None:
+            image = QtGui.QImage(path)
+        else:
+            image = self.image(path).copy(*key[2])
+        return self.put(key, image)
+
+    def pixmap(self, path, rect=None):
+        # 需要 QApplication，无界面模式下返回 QImage
+        if gui.headless:
+            return self.image(path, rect)
+        key = self.key('pixmap', path, rect)
+        pixmap = self.get(key)
+        if pixmap is not None:
+            return pixmap
+        return self.put(key, QtGui.QPixmap.fromImage(self.image(path, rect)))
+
+    def images(self, dir):
+        # 目录中按文件名排序的全部 png
+        files = sorted(f for f in os.listdir(dir) if f.endswith('.png'))
+        return [ self.image(os.path.join(dir, f)) for f in files ]
+
+    def sprites(self, path, directives, columns):
+        # 每行一个动作，每列一帧，返回 { 动作: [帧] }
+        image = self.image(path)
+        width = image.width() / columns
+        height = image.height() / len(directives)
+        return {
+            directive: [ self.image(path, (j * width, i * height, width, height)) for j in range(columns) ]
+            for i, directive in enumerate(directives)
+        }
+
+    def preload(self, images=(), dirs=(), files=()):
+        """
+        在后台线程中依次解码 images 与 dirs 中的图片，files 只读取一遍，让系统缓存文件内容（如音乐）
+        """
+        paths = list(images)
+        for dir in dirs:
+            paths.extend(os.path.join(dir, f) for f in sorted(os.listdir(dir)) if f.endswith('.png'))
+        job = Preload(len(paths) + len(files))
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(1, thread_name_prefix='preload')
+        job.ready = self.executor.submit(self._preload, job, paths, list(files))
+        return job
+
+    def _preload(self, job, paths, files):
+        for path in paths:
+            if job.cancelled:
+                return job
+            self.image(path)
+            job.done += 1
+        for path in files:
+            if job.cancelled:
+                return job
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    while f.read(1 << 20):
+                        pass
+            job.done += 1
+        return job
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'budget': self.budget,
+            'bundle': self.bundle.bytes() if self.bundle is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def format(self):
+        return [ 'assets %d  %.1f/%.0f MiB  hit %d  miss %d  evict %d' % (
+            len(self.entries), self.bytes / 2 ** 20, self.budget / 2 ** 20, self.hits, self.misses, self.evictions) ]
+
+class Preload:
+
+    def __init__(self, total) -> None:
+        self.total = total
+        self.done = 0
+        self.cancelled = False
+        # concurrent.futures.Future，全部加载完成时完成
+        self.ready = None
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        # 等待还没有加载的部分，加载中的异常在这里抛出
+        return self.ready.result(timeout)
+
+    def cancel(self):
+        self.cancelled = True
+
+assets = AssetCache()
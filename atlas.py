@@ -0,0 +1,202 @@
+"""
+纹理图集
+
+构建：把精灵、数字、生命、炸弹、按钮等小图片装箱到若干张图集中，
+按 ARGB32_Premultiplied 解码后的像素直接写入一个文件，文件头中保存每张图片在图集中的位置：
+
+    python atlas.py                       # 生成 assets/atlas.bundle
+    python atlas.py --output other.bundle
+
+文件格式（小端）：
+
+    MAGIC | 版本 uint32 | 索引长度 uint32 | 索引 JSON | 对齐到 PAGE_ALIGN | 图集 0 像素 | 对齐 | 图集 1 像素 ...
+
+运行时用 mmap 打开文件，每张图片是指向映射内存的 QImage（bytesPerLine 为图集的行宽），
+不解码 PNG，也不复制像素，裁剪矩形同样直接指向图集中的子矩形。
+修改图片后需要重新构建，图集中没有的图片仍然从 PNG 解码。
+"""
+
+import os
+import json
+import mmap
+import ctypes
+import struct
+import argparse
+
+from PyQt5 import QtGui
+from PyQt5 import sip
+
+MAGIC = b'THAB'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+PAGE_ALIGN = 4096
+# 图集的最大宽度与高度
+PAGE_WIDTH = 1024
+PAGE_HEIGHT = 2048
+# 图片之间留出的空白，避免缩放绘制时采样到相邻的图片
+PADDING = 1
+FORMAT = QtGui.QImage.Format_ARGB32_Premultiplied
+PATH = os.path.join('assets', 'atlas.bundle')
+
+# 打包的图片：目录中的全部 png 或单个文件
+SOURCES = [
+    'assets/numbers',
+    'assets/hearts',
+    'assets/stars',
+    'assets/buttons/start',
+    'assets/buttons/exit',
+    'assets/reimu_sprite.png',
+    'assets/dan.png',
+    'assets/Bomb_f01.png',
+    'assets/bm.png',
+    'assets/bm2.png',
+]
+
+def normalize(path):
+    return os.path.normpath(path).replace(os.sep, '/')
+
+def sources(paths=SOURCES):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.png'))
+        else:
+            files.append(path)
+    return files
+
+def pack(sizes):
+    """
+    按行装箱，sizes 为 [(宽, 高)]，返回 ([(图集, x, y)], [(图集宽, 图集高)])
+    按高度从大到小依次放入当前行，放不下时换行，图集高度不够时换一张图集
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    places = [ None ] * len(sizes)
+    pages = []
+    page = x = y = rowHeight = width = 0
+    for i in order:
+        w, h = sizes[i][0] + PADDING, sizes[i][1] + PADDING
+        if w > PAGE_WIDTH or h > PAGE_HEIGHT:
+            raise ValueError('图片过大：%dx%d' % sizes[i])
+        if x + w > PAGE_WIDTH:
+            x, y, rowHeight = 0, y + rowHeight, 0
+        if y + h > PAGE_HEIGHT:
+            pages.append((width, y))
+            page, x, y, rowHeight, width = page + 1, 0, 0, 0, 0
+        places[i] = (page, x, y)
+        x += w
+        rowHeight = max(rowHeight, h)
+        width = max(width, x)
+    pages.append((width, y + rowHeight))
+    return places, pages
+
+def build(output=PATH, paths=SOURCES):
+    files = sources(paths)
+    images = []
+    for f in files:
+        image = QtGui.QImage(f)
+        if image.isNull():
+            raise IOError('无法读取图片：' + f)
+        images.append(image.convertToFormat(FORMAT))
+    places, sizes = pack([ (image.width(), image.height()) for image in images ])
+
+    pageImages = []
+    for width, height in sizes:
+        page = QtGui.QImage(width, height, FORMAT)
+        page.fill(0)
+        pageImages.append(page)
+    painter = QtGui.QPainter()
+    for image, (page, x, y) in zip(images, places):
+        painter.begin(pageImages[page])
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.drawImage(x, y, image)
+        painter.end()
+
+    # 像素数据的偏移相对于索引之后对齐的位置
+    offsets = []
+    offset = 0
+    for page in pageImages:
+        offsets.append(offset)
+        offset = align(offset + page.sizeInBytes())
+    index = {
+        'pages': [ [ pageOffset, page.width(), page.height(), page.bytesPerLine() ] for page, pageOffset in zip(pageImages, offsets) ],
+        'images': { normalize(f): [ page, x, y, image.width(), image.height() ]
+                    for f, image, (page, x, y) in zip(files, images, places) },
+    }
+    data = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    start = align(HEADER.size + len(data))
+
+    with open(output, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(data)))
+        f.write(data)
+        for page, pageOffset in zip(pageImages, offsets):
+            f.write(b'\0' * (start + pageOffset - f.tell()))
+            bits = page.constBits()
+            bits.setsize(page.sizeInBytes())
+            f.write(bytes(bits))
+    return len(files), sizes, start + offset
+
+def align(offset):
+    return (offset + PAGE_ALIGN - 1) // PAGE_ALIGN * PAGE_ALIGN
+
+class AtlasBundle:
+    """
+    只读的图集文件，映射在进程结束前一直保持打开，所有图片都指向这段内存
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        # ACCESS_COPY 可以取得地址，且不会写回文件
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise IOError('图集格式不正确：' + path)
+        index = json.loads(self.map[HEADER.size:HEADER.size + length].decode('utf-8'))
+        self.pages = index['pages']
+        self.images = { path: tuple(place) for path, place in index['images'].items() }
+        # 保持对映射的引用，映射不会被关闭；address 为像素数据的起始地址
+        self._buffer = ctypes.c_char.from_buffer(self.map)
+        self.address = ctypes.addressof(self._buffer) + align(HEADER.size + length)
+
+    def __contains__(self, path):
+        return normalize(path) in self.images
+
+    def image(self, path, rect=None):
+        # 图集中的图片或其中的子矩形，不在图集中时返回 None
+        place = self.images.get(normalize(path))
+        if place is None:
+            return None
+        page, x, y, width, height = place
+        if rect is not None:
+            rx, ry, rw, rh = rect
+            # 与原图求交，和 QImage.copy 一致时超出部分会被裁掉
+            rw = min(rx + rw, width) - max(rx, 0)
+            rh = min(ry + rh, height) - max(ry, 0)
+            x, y = x + max(rx, 0), y + max(ry, 0)
+            width, height = max(rw, 0), max(rh, 0)
+        offset, _, _, stride = self.pages[page]
+        pointer = sip.voidptr(self.address + offset + y * stride + x * 4)
+        return QtGui.QImage(pointer, width, height, stride, FORMAT)
+
+    def bytes(self):
+        return len(self.map)
+
+def load(path=PATH):
+    # 文件不存在或格式不对时返回 None，使用 PNG
+    if not os.path.exists(path):
+        return None
+    try:
+        return AtlasBundle(path)
+    except (IOError, ValueError, struct.error):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='构建纹理图集')
+    parser.add_argument('--output', default=PATH, help='输出文件')
+    args = parser.parse_args()
+    count, pages, size = build(args.output)
+    print('%d images, %d pages (%s), %.1f KiB -> %s' % (
+        count, len(pages), ', '.join('%dx%d' % page for page in pages), size / 1024, args.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+弹幕压力测试
+
+在无界面模式下驱动真实的系统运行固定的场景，每个场景统计：
+1. 每秒帧数与每帧耗时的 p50 / p95 / p99 / 最大值
+2. tracemalloc 记录的内存峰值、结束时仍存活的内存块数（单独运行一次，不影响计时）
+3. 计时运行期间垃圾回收的次数
+
+结果可以保存为 JSON，并与之前保存的基准比较，超过容差的退步会列出并返回 1。
+
+    python bench.py --output baseline.json
+    python bench.py --baseline baseline.json
+    python bench.py --scenario bullets --bullets 8000
+"""
+
+import os
+# gui 在导入时创建，需要在导入前设置
+os.environ['TOUHOU_HEADLESS'] = '1'
+
+import gc
+import sys
+import json
+import random
+import argparse
+import platform
+import tracemalloc
+
+from PyQt5.QtCore import Qt
+
+from world import world
+from systems import EnemyManageSys, PlayerSys
+from entities import *
+from profiler import RingBuffer, clock
+
+SEED = 20240601
+# 不会再触发关卡中任何敌人的时间
+NO_SPAWN = 10 ** 9
+
+class Scenario:
+
+    def __init__(self, name, ticks, start=NO_SPAWN, fire=True, bullets=0) -> None:
+        self.name = name
+        self.ticks = ticks
+        # EnemyManageSys 的起始时间，从关卡中对应的位置开始
+        self.start = start
+        self.fire = fire
+        self.bullets = bullets
+
+    def setup(self):
+        random.seed(SEED)
+        world.setup(0, SEED)
+        # 不会因为没命而结束
+        world.entityManager.entites['hud'].heartCom.val = 10 ** 9
+        world.system(EnemyManageSys).time = self.start
+        if self.fire:
+            world.system(PlayerSys).dispatch(Qt.Key_Z, True)
+
+    def refill(self):
+        # 补充弹幕，保持场上有 bullets 颗
+        danmakus = Component.components.get('danmaku')
+        count = 0 if danmakus is None else len(danmakus)
+        for _ in range(self.bullets - count):
+            x = random.uniform(0, GROUND_RECT.width())
+            y = random.uniform(0, GROUND_RECT.height() / 2)
+            Danmaku.spawn(x, y, random.uniform(1, 4), random.uniform(0, 360), random.choice((10, 15, 20)))
+
+    def step(self):
+        if self.bullets:
+            self.refill()
+        world.step()
+
+    def run(self):
+        self.setup()
+        latencies = RingBuffer(self.ticks)
+        maxDanmaku = 0
+        collections = sum(stat['collections'] for stat in gc.get_stats())
+        start = clock()
+        for _ in range(self.ticks):
+            tickStart = clock()
+            self.step()
+            latencies.append(clock() - tickStart)
+            danmakus = Component.components.get('danmaku')
+            if danmakus is not None and len(danmakus) > maxDanmaku:
+                maxDanmaku = len(danmakus)
+        elapsed = clock() - start
+        collections = sum(stat['collections'] for stat in gc.get_stats()) - collections
+        p50, p95, p99, maximum = latencies.percentiles(50, 95, 99, 100)
+        result = {
+            'ticks': self.ticks,
+            'ticksPerSec': self.ticks / elapsed,
+            'p50': p50 * 1000,
+            'p95': p95 * 1000,
+            'p99': p99 * 1000,
+            'max': maximum * 1000,
+            'gcCollections': collections,
+            'maxDanmaku': maxDanmaku,
+            # 对象池的最高存活数与丢弃数
+            'pools': { pool.cls.__name__: pool.stats() for pool in EntityPool.pools },
+        }
+        result.update(self.memory())
+        return result
+
+    def memory(self):
+        # 重新运行一次，用 tracemalloc 统计内存
+        self.setup()
+        gc.collect()
+        tracemalloc.start()
+        before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        for _ in range(self.ticks):
+            self.step()
+        _, peak = tracemalloc.get_traced_memory()
+        after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+        return { 'peakMemory': peak, 'liveBlocks': after - before }
+
+def scenarios(bullets):
+    return [
+        # 10 个 Enemy12 / Enemy13 一组，共四波
+        Scenario('waves-12-13', 800, start=3690),
+        # Enemy9 与两侧的 Enemy10
+        Scenario('streams-9-10', 800, start=2860),
+        # Enemy15 的 BoliShooter，不开火，不会被击破
+        Scenario('boli-15', 1200, start=4490, fire=False),
+        Scenario('bullets', 600, bullets=bullets),
+    ]
+
+# 与基准比较的指标：(名字, 越大越好)
+METRICS = [ ('ticksPerSec', True), ('p95', False), ('p99', False), ('peakMemory', False) ]
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        for metric, higherIsBetter in METRICS:
+            old = base.get(metric)
+            new = result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higherIsBetter else change > tolerance
+            print('%-14s %-12s %12.3f -> %12.3f %+7.1f%%%s' % (name, metric, old, new, change * 100, '  REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append((name, metric))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='弹幕压力测试')
+    parser.add_argument('--scenario', action='append', help='只运行指定的场景，可以重复')
+    parser.add_argument('--ticks', type=int, help='覆盖每个场景的帧数')
+    parser.add_argument('--bullets', type=int, default=5000, help='bullets 场景的弹幕数量')
+    parser.add_argument('--scalar', action='store_true', help='不使用 NumPy 向量化运动学')
+    parser.add_argument('--output', metavar='PATH', help='把结果保存为 JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='与保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的退步比例')
+    args = parser.parse_args()
+
+    if args.scalar:
+        kinematics.enable(False)
+    world.init()
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'vectorized': kinematics.enabled,
+        'scenarios': {},
+    }
+    for scenario in scenarios(args.bullets):
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        if args.ticks:
+            scenario.ticks = args.ticks
+        result = scenario.run()
+        results['scenarios'][scenario.name] = result
+        print('%-14s %8.1f ticks/s  p50 %6.3f  p95 %6.3f  p99 %6.3f  max %6.3f ms  peak %6.1f MiB  max danmaku %d' % (
+            scenario.name, result['ticksPerSec'], result['p50'], result['p95'], result['p99'], result['max'],
+            result['peakMemory'] / 2 ** 20, result['maxDanmaku']))
+        for name, stats in result['pools'].items():
+            print('%-14s pool %-8s high %5d  dropped %d' % ('', name, stats['highWater'], stats['dropped']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
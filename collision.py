@@ -0,0 +1,116 @@
+"""
+碰撞检测
+
+碰撞层（CollisionLayer）由一种组件类型和碰撞体的外接矩形声明，外接矩形以 (中心 x, 中心 y, 半宽, 半高) 表示。
+两层之间的检测（CollisionPair）中，indexed 层每帧以矩形中心重建均匀网格，
+query 层的每个碰撞体按 indexed 层的最大半宽、半高与 margin 扩大后查询网格，候选再经过 test 精确判定。
+
+接触按 (query 层顺序, indexed 层顺序) 排列，与逐对检测的遍历顺序相同。
+本帧已销毁（alive 为 False）但还未删除的实体不参与检测。
+"""
+
+from spatial import SpatialGrid
+from entities import *
+
+class CollisionLayer:
+
+    def __init__(self, type, box, bounds) -> None:
+        self.type = type
+        self.box = box
+        self.grid = SpatialGrid(*bounds)
+        self.ids = None
+        self.entities = []
+        self.halfWidth = 0
+        self.halfHeight = 0
+
+    def members(self):
+        coms = Component.components.get(self.type)
+        if coms is None:
+            return []
+        members = []
+        for com in coms:
+            entity = Entity.entities[com.id]
+            if entity.alive:
+                members.append(entity)
+        return members
+
+    def gather(self):
+        # 返回 (实体 id 数组, 中心 x, 中心 y, 最大半宽, 最大半高)；返回 None 时逐个实体计算
+        return None
+
+    def index(self):
+        gathered = self.gather()
+        if gathered is not None:
+            self.entities = None
+            self.ids, xs, ys, self.halfWidth, self.halfHeight = gathered
+            self.grid.rebuild(xs, ys)
+            return
+        self.ids = None
+        self.entities = self.members()
+        xs = []
+        ys = []
+        halfWidth = 0
+        halfHeight = 0
+        for entity in self.entities:
+            x, y, width, height = self.box(entity)
+            xs.append(x)
+            ys.append(y)
+            if width > halfWidth:
+                halfWidth = width
+            if height > halfHeight:
+                halfHeight = height
+        self.halfWidth = halfWidth
+        self.halfHeight = halfHeight
+        self.grid.rebuild(xs, ys)
+
+    def resolve(self, indices):
+        # 网格下标 -> [(组件顺序, 实体)]，按组件顺序排列
+        if self.ids is None:
+            return [ (index, self.entities[index]) for index in indices if self.entities[index].alive ]
+        coms = Component.components.get(self.type)
+        resolved = []
+        for index in indices:
+            id = int(self.ids[index])
+            entity = Entity.entities[id]
+            if entity.alive:
+                resolved.append((coms.sparse[id], entity))
+        resolved.sort(key=lambda item: item[0])
+        return resolved
+
+class DanmakuLayer(CollisionLayer):
+
+    def __init__(self, box, bounds) -> None:
+        super().__init__('danmaku', box, bounds)
+
+    def gather(self):
+        if not kinematics.enabled:
+            return None
+        return kinematics.danmakuCenters(GROUND_RECT.x(), GROUND_RECT.y())
+
+class CollisionPair:
+
+    def __init__(self, indexed, query, test=None, handler=None, margin=0) -> None:
+        self.indexed = indexed
+        self.query = query
+        self.test = test
+        self.handler = handler
+        self.margin = margin
+        self.active = True
+
+    def detect(self, entity):
+        # entity 与 indexed 层的接触 [(entity, 对方, 对方的顺序)]
+        x, y, width, height = self.query.box(entity)
+        reachX = width + self.indexed.halfWidth + self.margin
+        reachY = height + self.indexed.halfHeight + self.margin
+        indices = self.indexed.grid.query(x - reachX, y - reachY, x + reachX, y + reachY)
+        contacts = []
+        for order, other in self.indexed.resolve(indices):
+            if self.test is None or self.test(entity, other):
+                contacts.append((entity, other, order))
+        return contacts
+
+    def contacts(self):
+        contacts = []
+        for entity in self.query.members():
+            contacts.extend(self.detect(entity))
+        return contacts
@@ -1,21 +1,25 @@
 from util import *
+from store import ComponentStore
+from kinematics import kinematics
+import abc
 import math
-import random
 from PyQt5 import QtCore
-from PyQt5.QtGui import QBrush, QColor, QImage, QPainter, QPen
+from PyQt5.QtGui import QBrush, QColor, QImage, QPainter, QPen, QPixmap
 
 GROUND_RECT = QtCore.QRectF(50, 20, 550, 675)
 
 class Component:
 
-    components = {}
+    components = ComponentStore()
 
     def __init__(self, cls, id) -> None:
-        if cls not in Component.components.keys():
-            Component.components[cls] = []
-        Component.components[cls].append(self)
         self.cls = cls
         self.id = id
+        self.attach()
+
+    def attach(self):
+        # 加入组件存储，对象池中的实体重新生成时也会调用
+        Component.components.add(self)
 
 class SelectCom(Component):
 
@@ -23,29 +27,35 @@ class SelectCom(Component):
         super().__init__('select-item', id)
         self.selected = selected
 
-class PositionCom(Component):
+class KinematicCom(Component):
+    """
+    运动相关组件，启用向量化运动学时 fields 中的属性保存在实体所在的 Kinematics 行中
+    """
+
+    fields = {}
+
+    def __new__(cls, *args, **kwargs):
+        if kinematics.enabled:
+            cls = kinematics.vectorize(cls)
+        return super().__new__(cls)
+
+    def attach(self):
+        super().attach()
+        self._row = kinematics.attach(self.id) if kinematics.enabled else None
+
+class PositionCom(KinematicCom):
+
+    fields = { 'x': 'x', 'y': 'y', 'enableOut': 'enableOut' }
 
     def __init__(self, id, x=0, y=0, enableOut=True) -> None:
         super().__init__('position', id)
-        self._x = x
-        self._y = y
+        self.x = x
+        self.y = y
         self.enableOut = enableOut
 
     @property
-    def x(self):
-        return self._x
-    @x.setter
-    def x(self, val):
-        self._x = val
-    @property
-    def y(self):
-        return self._y
-    @y.setter
-    def y(self, val):
-        self._y = val
-    @property
     def position(self):
-        return QtCore.QPointF(self._x + 50, self._y + 20)
+        return QtCore.QPointF(self.x + 50, self.y + 20)
 
 class RelativeBoxCom(Component):
 
@@ -59,13 +69,13 @@ class RelativeBoxCom(Component):
 
     @property
     def x(self):
-        return self.posCom.position.x() + self.offsetX
+        return self.posCom.x + self.offsetX
     @x.setter
     def x(self, val):
         pass
     @property
     def y(self):
-        return self.posCom.position.y() + self.offsetY
+        return self.posCom.y + self.offsetY
     @y.setter
     def y(self, val):
         pass
@@ -78,6 +88,8 @@ class RelativeBoxCom(Component):
 
 class RelativePositionCom(PositionCom):
 
+    fields = {}
+
     def __init__(self, id, player, offsetX, offsetY) -> None:
         super().__init__('position', id)
         self.player = player
@@ -102,14 +114,42 @@ class RelativePositionCom(PositionCom):
     def position(self):
         return QtCore.QPointF(self.x + 50, self.y + 20)
 
-class AccelerationCom(Component):
+def unitVector(direction):
+    # 方向（角度，0 为 y 轴正方向，90 为 x 轴正方向）的单位向量，保留两位小数
+    radians = math.radians(direction)
+    return round(math.sin(radians), 2), round(math.cos(radians), 2)
+
+class AccelerationCom(KinematicCom):
+
+    fields = { 'acceleration': 'acceleration', '_direction': 'accelerationDirection', 'ux': 'accelerationUx', 'uy': 'accelerationUy' }
 
     def __init__(self, id, acceleration, direction) -> None:
         super().__init__('acceleration', id)
         self.acceleration = acceleration
         self.direction = direction
 
-class VelocityCom(Component):
+    @property
+    def direction(self):
+        return self._direction
+    @direction.setter
+    def direction(self, val):
+        self._direction = val
+        self.ux, self.uy = unitVector(val)
+
+    def attach(self):
+        super().attach()
+        if self._row is not None:
+            kinematics.accelerated[self._row.slot] = True
+
+class VelocityCom(KinematicCom):
+    """
+    速度
+
+    设置 direction 时计算一次单位向量 (ux, uy)，每帧的位移为 (ux * speed, uy * speed)，
+    与每帧计算 round(sin(direction), 2) * speed 的结果相同，方向不变的弹幕不再每帧计算三角函数。
+    """
+
+    fields = { 'speed': 'speed', '_direction': 'direction', 'ux': 'ux', 'uy': 'uy' }
 
     def __init__(self, id, defaultSpeed, direction=0) -> None:
         super().__init__('velocity', id)
@@ -117,6 +157,22 @@ class VelocityCom(Component):
         self.speed = defaultSpeed
         self.direction = direction
 
+    @property
+    def direction(self):
+        return self._direction
+    @direction.setter
+    def direction(self, val):
+        self._direction = val
+        self.ux, self.uy = unitVector(val)
+
+    @property
+    def vx(self):
+        return self.ux * self.speed
+
+    @property
+    def vy(self):
+        return self.uy * self.speed
+
     @property
     def horizontalDirection(self):
         if self.direction > 0 and self.direction < 180:
@@ -129,13 +185,22 @@ class VelocityCom(Component):
     def calculate(self, rate):
         self.speed = self.defaultSpeed * rate
 
-class MoveCom(Component):
+class MoveCom(KinematicCom):
+
+    fields = { 'moving': 'moving' }
 
     def __init__(self, id, moving=True) -> None:
         super().__init__('move', id)
         self.moving = moving
 
-class SizeCom(Component):
+    def attach(self):
+        super().attach()
+        if self._row is not None:
+            kinematics.movable[self._row.slot] = True
+
+class SizeCom(KinematicCom):
+
+    fields = { 'width': 'width', 'height': 'height' }
 
     def __init__(self, id, width, height) -> None:
         super().__init__('size', id)
@@ -152,7 +217,7 @@ class ImageRenderCom(Component):
 
     def __init__(self, id, imagePath, rect=QtCore.QRectF(0, 0, 960, 720)) -> None:
         super().__init__('img-render', id)
-        self._image = QImage(imagePath)
+        self._image = assets.image(imagePath)
         self._graphicsItem = ImageGraphicsItem(self)
         self._rect = rect
 
@@ -167,7 +232,7 @@ class BoardRenderCom(Component):
 
     def __init__(self, id, imagePath) -> None:
         super().__init__('board-render', id)
-        self._image = QImage(imagePath)
+        self._image = assets.image(imagePath)
         self._graphicsItem = PaintGraphicsItem(self)
         self._rect = QtCore.QRectF(50, 20, 550, 675)
         self.counter = 0
@@ -230,122 +295,114 @@ class AnimationRenderCom(Component):
     def repeat(self):
         return self._repeat
 
-class HeartCom(Component):
+class HudCom(Component, metaclass=abc.ABCMeta):
+    """
+    HUD 上的数值，修改 value 时标记 dirty，绘制时才重新生成缓存的 QPixmap，其余帧只绘制一次缓存
+    数值在模拟线程修改、在 GUI 线程绘制：先清除 dirty 再读取数值，绘制期间的修改留到下一帧
+    """
 
-    def __init__(self, id, val) -> None:
-        super().__init__('heart', id)
-        self._images = loadImages('assets/hearts')
-        self._graphicsItem = ImageGraphicsItem(self)
-        self._rect = QtCore.QRectF(785, 245, 136, 22)
-        self.val = val
+    def __init__(self, cls, id, value, rect) -> None:
+        super().__init__(cls, id)
+        self._value = value
+        self._rect = rect
+        self._cache = None
+        self.dirty = True
+        self._graphicsItem = PaintGraphicsItem(self)
 
     @property
-    def index(self):
-        if self.val >= 0:
-            return self.val
-        else:
-            return 0
+    def value(self):
+        return self._value
+    @value.setter
+    def value(self, val):
+        if val != self._value:
+            self._value = val
+            self.dirty = True
 
     def boundingRect(self):
         return self._rect
 
-    @property
-    def image(self):
-        return self._images[self.index]
+    def paint(self, painter: QPainter):
+        if self.dirty or self._cache is None:
+            self.dirty = False
+            self._cache = self.render(self._value)
+        painter.drawPixmap(self._rect.topLeft(), self._cache)
+
+    @abc.abstractmethod
+    def render(self, value) -> QPixmap:
+        # 把 value 绘制为新的 QPixmap
+        pass
 
-class StarCom(Component):
+class HeartCom(HudCom):
 
     def __init__(self, id, val) -> None:
-        super().__init__('star', id)
-        self._images = loadImages('assets/stars')
-        self._graphicsItem = ImageGraphicsItem(self)
-        self._rect = QtCore.QRectF(785, 310, 136, 22)
-        self.value = val
+        self._images = loadImages('assets/hearts')
+        super().__init__('heart', id, val, QtCore.QRectF(785, 245, 136, 22))
 
     @property
-    def index(self):
-        if self.value < 0:
-            return 0
+    def val(self):
         return self.value
+    @val.setter
+    def val(self, val):
+        self.value = val
 
-    def boundingRect(self):
-        return self._rect
-
-    @property
-    def image(self):
-        return self._images[self.index]
-
-class ScoreCom(Component):
-
-    def __init__(self, id) -> None:
-        super().__init__('score', id)
-        self.value = 0
-        self._graphicsItem = PaintGraphicsItem(self)
-        self.images = {
-            '0': QImage('assets/numbers/0.png'),
-            '1': QImage('assets/numbers/1.png'),
-            '2': QImage('assets/numbers/2.png'),
-            '3': QImage('assets/numbers/3.png'),
-            '4': QImage('assets/numbers/4.png'),
-            '5': QImage('assets/numbers/5.png'),
-            '6': QImage('assets/numbers/6.png'),
-            '7': QImage('assets/numbers/7.png'),
-            '8': QImage('assets/numbers/8.png'),
-            '9': QImage('assets/numbers/9.png'),
-            '_': QImage('assets/numbers/_.png'),
-        }
+    def render(self, value):
+        return QPixmap.fromImage(self._images[max(value, 0)])
 
-    def boundingRect(self):
-        return QtCore.QRectF(720, 170, 168, 29)
+class StarCom(HudCom):
 
-    def paint(self, painter: QPainter):
-        score = self.value
-        scoreString = str(score).zfill(10)
-        xNow = 904
-        for i in range(9, -1, -1):
-            # integer at i
-            integer = scoreString[i]
-            painter.drawImage(xNow, 170, self.images[integer])
+    def __init__(self, id, val) -> None:
+        self._images = loadImages('assets/stars')
+        super().__init__('star', id, val, QtCore.QRectF(785, 310, 136, 22))
+
+    def render(self, value):
+        return QPixmap.fromImage(self._images[max(value, 0)])
+
+def digitImages():
+    # 分数与擦弹数共用的数字图片
+    return { c: assets.image('assets/numbers/%s.png' % c) for c in '0123456789_' }
+
+class DigitsCom(HudCom):
+    """
+    右对齐的数字，每三位之间画一个分隔符
+    """
+
+    # 最右一位的左边，数字与分隔符的宽度
+    RIGHT = 904
+    DIGIT = 14
+    SEPARATOR = 12
+    HEIGHT = 29
+
+    def __init__(self, cls, id, digits, y) -> None:
+        self.images = digitImages()
+        self.digits = digits
+        left = self.RIGHT - (digits - 1) * self.DIGIT - (digits - 1) // 3 * self.SEPARATOR
+        super().__init__(cls, id, 0, QtCore.QRectF(left, y, self.RIGHT + self.DIGIT - left, self.HEIGHT))
+
+    def render(self, value):
+        pixmap = QPixmap(int(self._rect.width()), int(self._rect.height()))
+        pixmap.fill(QtCore.Qt.transparent)
+        painter = QPainter(pixmap)
+        string = str(value).zfill(self.digits)
+        xNow = self.RIGHT - self._rect.left()
+        for i in range(self.digits - 1, -1, -1):
+            integer = string[i]
+            painter.drawImage(QtCore.QPointF(xNow, 0), self.images[integer])
             if (i + 2) % 3 == 0:
-                xNow -= 12
-                painter.drawImage(xNow, 170, self.images['_'])
-            xNow -= 14
+                xNow -= self.SEPARATOR
+                painter.drawImage(QtCore.QPointF(xNow, 0), self.images['_'])
+            xNow -= self.DIGIT
+        painter.end()
+        return pixmap
 
-
-class CaDanCom(Component):
+class ScoreCom(DigitsCom):
 
     def __init__(self, id) -> None:
-        super().__init__('cadan', id)
-        self.value = 0
-        self._graphicsItem = PaintGraphicsItem(self)
-        self.images = {
-            '0': QImage('assets/numbers/0.png'),
-            '1': QImage('assets/numbers/1.png'),
-            '2': QImage('assets/numbers/2.png'),
-            '3': QImage('assets/numbers/3.png'),
-            '4': QImage('assets/numbers/4.png'),
-            '5': QImage('assets/numbers/5.png'),
-            '6': QImage('assets/numbers/6.png'),
-            '7': QImage('assets/numbers/7.png'),
-            '8': QImage('assets/numbers/8.png'),
-            '9': QImage('assets/numbers/9.png'),
-            '_': QImage('assets/numbers/_.png'),
-        }
+        super().__init__('score', id, 10, 170)
 
-    def boundingRect(self):
-        return QtCore.QRectF(761, 373, 160, 29)
+class CaDanCom(DigitsCom):
 
-    def paint(self, painter: QPainter):
-        scoreString = str(self.value).zfill(7)
-        xNow = 904
-        for i in range(6, -1, -1):
-            # integer at i
-            integer = scoreString[i]
-            painter.drawImage(xNow, 373, self.images[integer])
-            if (i + 2) % 3 == 0:
-                xNow -= 12
-                painter.drawImage(xNow, 373, self.images['_'])
-            xNow -= 14
+    def __init__(self, id) -> None:
+        super().__init__('cadan', id, 7, 373)
 
 class FireCom(Component):
 
@@ -365,8 +422,15 @@ class DanCom(Component):
 class DanmakuCom(Component):
 
     def __init__(self, danmaku) -> None:
-        super().__init__('danmaku', danmaku.id)
         self.danmaku = danmaku
+        super().__init__('danmaku', danmaku.id)
+
+    def attach(self):
+        super().attach()
+        if kinematics.enabled:
+            row = kinematics.attach(self.id)
+            kinematics.danmaku[row.slot] = True
+            kinematics.baseSpeed[row.slot] = self.danmaku.speed
 
 class EnemyCom(Component):
 
@@ -374,133 +438,25 @@ class EnemyCom(Component):
         super().__init__('enemy', enemy.id)
         self.enemy = enemy
 
-class DirectionShooterCom(Component):
+class ShooterCom(Component):
+    """
+    射击：每 interval 帧按 pattern（pattern.py 中的程序）发出一组速度为 speed、大小为 size 的弹幕
+    """
 
-    def __init__(self, enemy, direction=0, speed=10, interval=10, triple=-1, five=-1, double=-1, four=-1) -> None:
+    def __init__(self, enemy, pattern, speed=10, interval=10, size=15) -> None:
         super().__init__('shooter', enemy.id)
+        self.pattern = pattern
         self.speed = speed
         self.interval = interval
+        self.size = size
         self.cooldown = 0
         self.posCom = enemy.positionCom
-        self.tripleDegree = triple
-        self.five = five
-        self.double = double
-        self.four = four
-        self._direction = direction
-
-    def direction(self, player):
-        direction = self._direction
-        if self.tripleDegree != -1:
-            return [ direction - self.tripleDegree, direction, direction + self.tripleDegree ]
-        elif self.five != -1:
-            return [ direction - self.five * 2, direction - self.five, direction, direction + self.five, direction + self.five * 2 ]
-        elif self.double != -1:
-            return [ direction - self.double / 2, direction + self.double / 2 ]
-        elif self.four != -1:
-            return [ direction - self.four * 3 / 2, direction - self.four / 2, direction + self.four / 2, direction + self.four * 3 / 2 ]
-        else:
-            return [ direction ]
+        # 程序 -> 该程序在这个敌人上的状态（旋转的角度等）
+        self.state = {}
 
-
-class RandomShooterCom(Component):
-
-    def __init__(self, enemy, speed=10, interval=10, triple=-1, five=-1, double=-1, four=-1) -> None:
-        super().__init__('shooter', enemy.id)
-        self.speed = speed
-        self.interval = interval
-        self.cooldown = 0
-        self.posCom = enemy.positionCom
-        self.tripleDegree = triple
-        self.five = five
-        self.double = double
-        self.four = four
-
-    def direction(self, player):
-        direction = random.randrange(0, 360)
-        if self.tripleDegree != -1:
-            return [ direction - self.tripleDegree, direction, direction + self.tripleDegree ]
-        elif self.five != -1:
-            return [ direction - self.five * 2, direction - self.five, direction, direction + self.five, direction + self.five * 2 ]
-        elif self.double != -1:
-            return [ direction - self.double / 2, direction + self.double / 2 ]
-        elif self.four != -1:
-            return [ direction - self.four * 3 / 2, direction - self.four / 2, direction + self.four / 2, direction + self.four * 3 / 2 ]
-        else:
-            return [ direction ]
-
-
-class PlayerShooterCom(Component):
-
-    def __init__(self, enemy, speed=10, interval=10, triple=-1, five=-1, double=-1, four=-1) -> None:
-        super().__init__('shooter', enemy.id)
-        self.speed = speed
-        self.interval = interval
-        self.cooldown = 0
-        self.posCom = enemy.positionCom
-        self.tripleDegree = triple
-        self.five = five
-        self.double = double
-        self.four = four
-
-    def direction(self, player):
-        pos = self.posCom.position
-        x = pos.x()
-        y = pos.y()
-        pX = player.positionCom.position.x() + 16
-        pY = player.positionCom.position.y() + 24
-        dX = pX - x
-        dY = pY - y
-        direction = round(math.atan(dX / dY) * 180 / math.pi, 2)
-        if self.tripleDegree != -1:
-            return [ direction - self.tripleDegree, direction, direction + self.tripleDegree ]
-        elif self.five != -1:
-            return [ direction - self.five * 2, direction - self.five, direction, direction + self.five, direction + self.five * 2 ]
-        elif self.double != -1:
-            return [ direction - self.double / 2, direction + self.double / 2 ]
-        elif self.four != -1:
-            return [ direction - self.four * 3 / 2, direction - self.four / 2, direction + self.four / 2, direction + self.four * 3 / 2 ]
-        else:
-            return [ direction ]
-
-class RotateShooterCom(Component):
-
-    def __init__(self, enemy, speed=5, interval=5, count=6) -> None:
-        super().__init__('shooter', enemy.id)
-        self.speed = speed
-        self.interval = interval
-        self.cooldown = 0
-        self.posCom = enemy.positionCom
-        self.count = count
-        self.currentDirection = 0
-        self.size = 10
-
-    def direction(self, player):
-        average = 360 / self.count
-        directions = [ self.currentDirection - i * average for i in range(self.count) ]
-        self.currentDirection += 3
-        return directions
-
-class BoliShooterCom(Component):
-
-    def __init__(self, enemy, speed=6, interval=2, count=8, rotate1=2, rotate2=10) -> None:
-        super().__init__('shooter', enemy.id)
-        self.speed = speed
-        self.interval = interval
-        self.cooldown = 0
-        self.posCom = enemy.positionCom
-        self.count = count
-        self.currentDirection = 0
-        self.size = 10
-        self.rotate1 = rotate1
-        self.rotate2 = rotate2
-        self.functionX = 0
-
-    def direction(self, player):
-        average = 360 / self.count
-        self.functionX += self.rotate1
-        directions = [ self.currentDirection - i * average for i in range(self.count) ]
-        self.currentDirection += self.rotate2 * math.sin(math.radians(self.functionX))
-        return directions
+    def volley(self, player, rng):
+        # 本次射击的全部方向，随机方向取自 rng
+        return self.pattern.emit(self, player, rng)
 
 
 class HealthCom(Component):
@@ -0,0 +1,291 @@
+"""
+确定性校验
+
+开启后每帧结束时计算全部实体的位置、速度、生命值的哈希：
+
+    分组      player / enemy / dan / danmaku 为对应组件的实体，hud 为分数、擦弹、残机、炸弹
+    实体      crc32(x, y, speed, direction, health)，没有的字段为 0
+    分组哈希  实体哈希之和（与遍历顺序、实体编号无关，对象池复用的实体也能与新建的实体比较）与实体数
+    累积哈希  crc32(本帧全部分组, 上一帧的累积哈希)，第一次不同的帧之后都不同
+
+文件格式（小端）：
+
+    MAGIC | 版本 uint8 | 关卡 uint8 | 种子 uint32 | 帧数 uint32 | zlib(每帧 累积哈希 + 每组 (实体数, 哈希) 的 uint32)
+
+    python game.py --headless --replay run.rep --hash before.hash   # 修改前
+    python game.py --headless --replay run.rep --hash after.hash    # 修改后
+    python determinism.py compare before.hash after.hash            # 第一次不同的帧与不同的分组
+
+    # 在当前代码中依次运行两种实现（默认逐实体计算、不使用对象池 对比 向量化、使用对象池），
+    # 找到第一次不同的帧后两边重新运行到这一帧，列出不同的实体
+    python determinism.py check --replay run.rep
+    python determinism.py check --ticks 3000 --seed 1 --reference scalar --candidate vectorized
+"""
+
+import os
+import sys
+import zlib
+import array
+import struct
+import argparse
+from collections import Counter
+
+MAGIC = b'THSH'
+VERSION = 1
+HEADER = struct.Struct('<4sBBII')
+STATE = struct.Struct('<5d')
+GROUPS = ('player', 'enemy', 'dan', 'danmaku', 'hud')
+# 每帧的 uint32 个数：累积哈希 + 每组 (实体数, 哈希)
+WIDTH = 1 + 2 * len(GROUPS)
+
+def entityState(entity):
+    # (x, y, speed, direction, health)
+    pos = entity.positionCom
+    velocity = getattr(entity, 'velocityCom', None)
+    health = getattr(entity, 'healthCom', None)
+    return (
+        float(pos.x), float(pos.y),
+        float(velocity.speed) if velocity is not None else 0.0,
+        float(velocity.direction) if velocity is not None else 0.0,
+        float(health.health) if health is not None else 0.0,
+    )
+
+def hudState(hud):
+    return (float(hud.scoreCom.value), float(hud.cadanCom.value), float(hud.heartCom.val), float(hud.starCom.value), 0.0)
+
+def states(world):
+    # 分组 -> [(实体编号, 状态)]
+    from entities import Entity
+    from components import Component
+    result = {}
+    for group in GROUPS[:-1]:
+        entities = Entity.entities
+        result[group] = [ (com.id, entityState(entities[com.id])) for com in Component.components.get(group) or () ]
+    hud = world.entityManager.entites.get('hud')
+    result['hud'] = [ (-1, hudState(hud)) ] if hud is not None else []
+    return result
+
+class HashLog:
+
+    def __init__(self, stage=0, seed=0) -> None:
+        self.stage = stage
+        self.seed = seed
+        self.values = array.array('I')
+
+    def __len__(self):
+        return len(self.values) // WIDTH
+
+    def tick(self, i):
+        return self.values[i * WIDTH:(i + 1) * WIDTH]
+
+    def rolling(self, i):
+        return self.values[i * WIDTH]
+
+    def groups(self, i):
+        # 分组 -> (实体数, 哈希)
+        row = self.tick(i)
+        return { group: (row[1 + 2 * k], row[2 + 2 * k]) for k, group in enumerate(GROUPS) }
+
+    def encode(self):
+        values = array.array('I', self.values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return HEADER.pack(MAGIC, VERSION, self.stage, self.seed, len(self)) + zlib.compress(values.tobytes(), 9)
+
+    @staticmethod
+    def decode(data):
+        magic, version, stage, seed, ticks = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('哈希文件格式不正确')
+        log = HashLog(stage, seed)
+        log.values.frombytes(zlib.decompress(data[HEADER.size:]))
+        if sys.byteorder != 'little':
+            log.values.byteswap()
+        if len(log) != ticks:
+            raise ValueError('哈希文件不完整')
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode())
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return HashLog.decode(f.read())
+
+class StateHasher:
+    """
+    每帧结束时由 World.step() 调用 update()，哈希追加到 log
+    """
+
+    def __init__(self, world, stage=0, seed=0) -> None:
+        self.world = world
+        self.log = HashLog(stage, seed)
+        self.previous = 0
+
+    def update(self):
+        row = [ 0 ]
+        for group, entries in states(self.world).items():
+            total = 0
+            for _, state in entries:
+                total += zlib.crc32(STATE.pack(*state))
+            row.append(len(entries))
+            row.append(total & 0xffffffff)
+        self.previous = row[0] = zlib.crc32(struct.pack('<%dI' % (WIDTH - 1), *row[1:]), self.previous)
+        self.log.values.extend(row)
+
+    def save(self, path):
+        self.log.save(path)
+
+def firstDivergence(a, b):
+    # 第一次不同的帧，相同时返回 None；一边更短时返回较短的长度
+    n = min(len(a), len(b))
+    lo, hi = 0, n
+    # 累积哈希不同之后一直不同，二分查找
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if a.rolling(mid) != b.rolling(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo < n:
+        return lo
+    return n if len(a) != len(b) else None
+
+def compare(a, b, out=print):
+    # 返回第一次不同的帧，并输出不同的分组
+    if (a.stage, a.seed) != (b.stage, b.seed):
+        out('warning: stage/seed differ (%d/%d vs %d/%d)' % (a.stage, a.seed, b.stage, b.seed))
+    tick = firstDivergence(a, b)
+    if tick is None:
+        out('identical: %d ticks' % len(a))
+        return None
+    if tick >= min(len(a), len(b)):
+        out('identical for %d ticks, lengths differ (%d vs %d)' % (tick, len(a), len(b)))
+        return tick
+    out('first divergence at tick %d' % tick)
+    groupsA, groupsB = a.groups(tick), b.groups(tick)
+    for group in GROUPS:
+        (countA, hashA), (countB, hashB) = groupsA[group], groupsB[group]
+        if countA != countB:
+            out('  %-8s count %d vs %d' % (group, countA, countB))
+        elif hashA != hashB:
+            out('  %-8s %d entities, hash %08x vs %08x' % (group, countA, hashA, hashB))
+    return tick
+
+def diffStates(a, b, limit=20, out=print):
+    # 列出两次运行同一帧中不同的实体：先去掉两边状态相同的实体（使用对象池时编号可能不同），
+    # 剩下的实体编号相同时按编号对比，其余为只在一边出现的实体
+    shown = 0
+    for group in GROUPS:
+        entriesA, entriesB = a.get(group, ()), b.get(group, ())
+        common = Counter(state for _, state in entriesA) & Counter(state for _, state in entriesB)
+        left, right = unmatched(entriesA, common), unmatched(entriesB, common)
+        lines = []
+        for id in sorted(left.keys() & right.keys()):
+            lines.append('  %-8s #%-6d %s -> %s' % (group, id, formatState(left[id]), formatState(right[id])))
+        lines.extend('  %-8s #%-6d only in reference %s' % (group, id, formatState(left[id])) for id in sorted(left.keys() - right.keys()))
+        lines.extend('  %-8s #%-6d only in candidate %s' % (group, id, formatState(right[id])) for id in sorted(right.keys() - left.keys()))
+        for line in lines:
+            if shown < limit:
+                out(line)
+            shown += 1
+    if shown > limit:
+        out('  ... %d more' % (shown - limit))
+    return shown
+
+def unmatched(entries, common):
+    # entries 中去掉 common 计数的状态之后剩下的 {编号: 状态}
+    common = Counter(common)
+    result = {}
+    for id, state in entries:
+        if common[state] > 0:
+            common[state] -= 1
+        else:
+            result[id] = state
+    return result
+
+def formatState(state):
+    return '(%s)' % ', '.join('%r' % value for value in state)
+
+def configure(name):
+    # 实现的组合，例如 "scalar,unpooled"：scalar / vectorized 运动学，pooled / unpooled 对象池
+    from kinematics import kinematics
+    from entities import EntityPool
+    options = set(filter(None, name.split(',')))
+    unknown = options - { 'scalar', 'vectorized', 'pooled', 'unpooled' }
+    if unknown:
+        raise ValueError('未知的实现：%s' % ', '.join(sorted(unknown)))
+    kinematics.enable('scalar' not in options)
+    for pool in EntityPool.pools:
+        if not hasattr(pool, 'defaultCapacity'):
+            pool.defaultCapacity = pool.capacity
+        pool.capacity = 0 if 'unpooled' in options else pool.defaultCapacity
+
+def run(world, name, ticks, stage, seed, stopAt=None):
+    # 用 name 的实现运行 ticks 帧，返回 (HashLog, stopAt 帧结束时的状态)
+    world.running = False
+    world.systemManager.cancelSystems()
+    world.entityManager.cancelEntities()
+    configure(name)
+    world.setup(stage, seed)
+    hasher = world.hasher = StateHasher(world, stage, world.seed)
+    captured = None
+    for i in range(ticks):
+        if not world.running:
+            break
+        world.step()
+        if i == stopAt:
+            captured = states(world)
+            break
+    world.hasher = None
+    world.running = False
+    return hasher.log, captured
+
+def check(args):
+    from world import world
+    from replay import InputLog
+    if args.replay is not None:
+        world.replay = InputLog.load(args.replay)
+        stage, seed = world.replay.stage, world.replay.seed
+        ticks = args.ticks or len(world.replay)
+    else:
+        stage, seed, ticks = args.stage, args.seed, args.ticks or 4500
+    world.init()
+    reference, _ = run(world, args.reference, ticks, stage, seed)
+    candidate, _ = run(world, args.candidate, ticks, stage, seed)
+    print('reference: %s, candidate: %s, stage %d, seed %d' % (args.reference, args.candidate, stage, seed))
+    tick = compare(reference, candidate)
+    if tick is None or tick >= min(len(reference), len(candidate)):
+        return 0 if tick is None else 1
+    # 两边重新运行到第一次不同的帧
+    _, left = run(world, args.reference, ticks, stage, seed, tick)
+    _, right = run(world, args.candidate, ticks, stage, seed, tick)
+    diffStates(left, right, args.limit)
+    return 1
+
+def main():
+    parser = argparse.ArgumentParser(description='确定性校验')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compareParser = commands.add_parser('compare', help='比较两个哈希文件')
+    compareParser.add_argument('reference')
+    compareParser.add_argument('candidate')
+    checkParser = commands.add_parser('check', help='在当前代码中比较两种实现')
+    checkParser.add_argument('--replay', metavar='PATH', help='使用录像的关卡、种子与输入，默认没有输入')
+    checkParser.add_argument('--stage', type=int, default=0)
+    checkParser.add_argument('--seed', type=int, default=1)
+    checkParser.add_argument('--ticks', type=int, help='运行的帧数，默认 4500，回放时为录像的长度')
+    checkParser.add_argument('--reference', default='scalar,unpooled', help='参考实现，默认 scalar,unpooled')
+    checkParser.add_argument('--candidate', default='vectorized,pooled', help='待检查的实现，默认 vectorized,pooled')
+    checkParser.add_argument('--limit', type=int, default=20, help='最多列出的不同实体')
+    args = parser.parse_args()
+    if args.command == 'compare':
+        tick = compare(HashLog.load(args.reference), HashLog.load(args.candidate))
+        return 0 if tick is None else 1
+    # gui 在导入时创建，需要在导入前设置
+    os.environ['TOUHOU_HEADLESS'] = '1'
+    return check(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
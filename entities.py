@@ -1,9 +1,11 @@
 import abc
+import math
 
 from PyQt5 import QtCore
-from PyQt5.QtGui import QPainter
+from PyQt5.QtGui import QFont, QPainter, QPixmap
 
 from components import *
+from snapshot import snapshots, interpolate
 
 class Entity(metaclass=abc.ABCMeta):
 
@@ -11,11 +13,143 @@ class Entity(metaclass=abc.ABCMeta):
 
     entities = {}
 
+    # 销毁后为 False，直到帧末真正删除
+    alive = True
+    # 所属的对象池，删除后放回
+    pool = None
+
     def __init__(self) -> None:
         self.id = Entity.nextEntityId
         Entity.nextEntityId += 1
         Entity.entities[self.id] = self
 
+    def destroy(self):
+        # 延迟到帧末由 commands.flush() 删除，重复调用无效
+        if not self.alive:
+            return
+        self.alive = False
+        commands.destroy(self)
+
+    def remove(self):
+        # 立即删除
+        Entity.entities.pop(self.id, None)
+        Component.components.removeEntity(self.id)
+        kinematics.release(self.id)
+        if self.pool is not None:
+            self.pool.release(self)
+
+class CommandBuffer:
+    """
+    每帧的命令缓冲
+
+    系统执行期间的销毁与生成先登记在这里，帧末 flush() 一次执行：
+    先把全部销毁的实体批量从组件存储、运动学中删除并放回对象池，再按登记顺序生成新实体。
+    因此系统可以在遍历组件时直接销毁实体；已销毁的实体 alive 为 False，帧末之前仍在组件数组中。
+    """
+
+    def __init__(self) -> None:
+        # 实体 id -> 实体，保持登记顺序
+        self.destroys = {}
+        self.spawns = []
+        # 最近一次 flush() 删除的实体 id，对象池可能在同一次 flush() 中以相同的 id 重新生成
+        self.destroyed = {}
+
+    def destroy(self, entity):
+        self.destroys[entity.id] = entity
+
+    def spawn(self, factory, *args):
+        self.spawns.append((factory, args))
+
+    def flush(self):
+        destroys = self.destroyed = self.destroys
+        self.destroys = {}
+        if destroys:
+            ids = list(destroys)
+            for id in ids:
+                Entity.entities.pop(id, None)
+            Component.components.removeEntities(ids)
+            kinematics.releaseMany(ids)
+            for entity in destroys.values():
+                if entity.pool is not None:
+                    entity.pool.release(entity)
+        spawns = self.spawns
+        if spawns:
+            self.spawns = []
+            for factory, args in spawns:
+                factory(*args)
+
+    def clear(self):
+        self.destroys = {}
+        self.spawns.clear()
+        self.destroyed = {}
+
+commands = CommandBuffer()
+
+class EntityPool:
+    """
+    实体对象池
+
+    被销毁的实体连同组件放入空闲列表（最多 capacity 个），生成时优先取出并调用 reset() 重新初始化，
+    不再重新分配实体与组件。limit 为同时存活的实体数上限，超过时 spawn() 返回 None。
+    """
+
+    pools = []
+
+    def __init__(self, cls, capacity, limit=None) -> None:
+        self.cls = cls
+        self.capacity = capacity
+        self.limit = limit
+        self.free = []
+        self.live = 0
+        self.highWater = 0
+        self.dropped = 0
+        cls.pool = self
+        EntityPool.pools.append(self)
+
+    def spawn(self, *args):
+        if self.limit is not None and self.live >= self.limit:
+            self.dropped += 1
+            return None
+        if self.free:
+            entity = self.free.pop()
+            Entity.entities[entity.id] = entity
+            entity.alive = True
+            entity.reset(*args)
+        else:
+            entity = self.cls(*args)
+        self.live += 1
+        if self.live > self.highWater:
+            self.highWater = self.live
+        return entity
+
+    def release(self, entity):
+        self.live -= 1
+        if len(self.free) < self.capacity:
+            self.free.append(entity)
+
+    def preallocate(self, count, *args):
+        # 预先创建实体，直到空闲列表中有 count 个，不计入最高存活数与丢弃数
+        for _ in range(min(count, self.capacity) - len(self.free)):
+            entity = self.cls(*args)
+            # remove() 放回空闲列表时减少存活数
+            self.live += 1
+            entity.remove()
+
+    def stats(self):
+        return { 'live': self.live, 'highWater': self.highWater, 'free': len(self.free), 'dropped': self.dropped }
+
+    @staticmethod
+    def format():
+        # 每个对象池一行：存活数、最高存活数、空闲数、超过上限被丢弃的生成
+        return [ 'pool %-8s %5d  high %5d  free %5d  drop %d' % (pool.cls.__name__, pool.live, pool.highWater, len(pool.free), pool.dropped)
+                 for pool in EntityPool.pools ]
+
+    def clear(self):
+        self.free.clear()
+        self.live = 0
+        self.highWater = 0
+        self.dropped = 0
+
 class AnimationEntity(Entity):
 
     @abc.abstractproperty
@@ -80,7 +214,8 @@ class GamePlayer(Entity):
         self.positionCom = PositionCom(self.id, 259, 600, enableOut=False)
         self.velocityCom = VelocityCom(self.id, 8)
         self.fireCom = FireCom(self.id, 30, 10)
-        self.collisionCom = RelativeBoxCom(self.id, self.positionCom, 11, 19, 10, 10)
+        # 判定点：半径 5，中心在 (22, 19)
+        self.collisionCom = RelativeBoxCom(self.id, self.positionCom, 17, 14, 10, 10)
         self.invincible = 0
         self.reviveTime = 240
         self.lowSpeed = False
@@ -100,6 +235,62 @@ class GameHUD(Entity):
         self.starCom = StarCom(self.id, 4)
         self.cadanCom = CaDanCom(self.id)
 
+class PerformanceOverlay(Entity):
+    """
+    性能统计：显示在分数面板的计数下方，按 P 切换
+
+    实体数量与对象池在模拟线程发布快照时记录（capture），绘制时只读取快照，不访问组件存储
+    """
+
+    # 实体数量每行的字符数
+    COUNTS_WIDTH = 50
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._graphicsItem = PaintGraphicsItem(self)
+        # 擦弹计数（y 373 ~ 402）之下，不遮挡面板上的计数
+        self.rect = QtCore.QRectF(610, 410, 345, 305)
+        self.font = QFont('Monospace', 8)
+        self.font.setStyleHint(QFont.TypeWriter)
+        self.background = QColor(0, 0, 0, 160)
+        self.color = QColor(255, 255, 255)
+        # 最近一次绘制时是否显示
+        self.shown = False
+
+    def boundingRect(self):
+        return self.rect
+
+    @property
+    def dirty(self):
+        # 显示时每帧重绘，隐藏后再重绘一次清除
+        return profiler.overlay or self.shown
+
+    def capture(self, snapshot):
+        if profiler.overlay:
+            snapshot.counts = profiler.entityCounts(Component.components)
+            snapshot.stats += EntityPool.format()
+
+    def paint(self, painter: QPainter):
+        self.shown = profiler.overlay
+        if not profiler.overlay:
+            return
+        painter.fillRect(self.rect, self.background)
+        painter.setFont(self.font)
+        painter.setPen(self.color)
+        lineHeight = painter.fontMetrics().height()
+        y = self.rect.top() + lineHeight
+        # 较短的汇总在前，各系统的耗时在后，放不下的部分不显示
+        # 弹幕的绘制方式由 GUI 线程切换（V），直接读取
+        lines = [ 'danmaku rendering: %s' % ('batched' if GameDanmaku.batched else 'per item') ]
+        snapshot = snapshots.current
+        if snapshot is not None:
+            lines += snapshot.stats + profiler.formatCounts(snapshot.counts, self.COUNTS_WIDTH)
+        for line in lines + gui.format() + assets.format() + profiler.format():
+            if y > self.rect.bottom():
+                break
+            painter.drawText(QtCore.QPointF(self.rect.left() + 6, y), line)
+            y += lineHeight
+
 class ButtonStart(Entity):
 
     def __init__(self) -> None:
@@ -126,19 +317,38 @@ class Dan(Entity):
         self.positionCom = PositionCom(self.id, pos.x + 3, pos.y - 57, False)
         self.sizeCom = SizeCom(self.id, 28, 56)
         self.velocityCom = VelocityCom(self.id, speed)
-        self.destoryed = False
+
+    @staticmethod
+    def spawn(player, speed):
+        return danPool.spawn(player, speed)
+
+    def reset(self, player, speed):
+        for component in (self.danCom, self.positionCom, self.sizeCom, self.velocityCom):
+            component.attach()
+        pos = player.positionCom
+        self.positionCom.x = pos.x + 3
+        self.positionCom.y = pos.y - 57
+        self.positionCom.enableOut = False
+        self.sizeCom.width = 28
+        self.sizeCom.height = 56
+        self.velocityCom.defaultSpeed = speed
+        self.velocityCom.speed = speed
+        self.velocityCom.direction = 0
 
     def destory(self):
-        if self.destoryed:
-            return
-        Entity.entities.pop(self.id)
-        DanCom.components.get('dan').remove(self.danCom)
-        DanCom.components.get('position').remove(self.positionCom)
-        DanCom.components.get('size').remove(self.sizeCom)
-        DanCom.components.get('velocity').remove(self.velocityCom)
-        self.destoryed = True
+        self.destroy()
 
 class GameDanmaku(Entity):
+    """
+    弹幕的绘制
+
+    batched 为 True 时，每种尺寸的弹幕只绘制一次到 QPixmap 中缓存，
+    每帧按尺寸分组，用 drawPixmapFragments 一次画出同一尺寸的全部弹幕；
+    为 False 时逐个 drawEllipse，用于对比。
+    绘制只读取 capture() 写入快照的数据。
+    """
+
+    batched = True
 
     def __init__(self) -> None:
         super().__init__()
@@ -147,430 +357,102 @@ class GameDanmaku(Entity):
 
         self.pen = QPen(QColor(201, 93, 99), 2)
         self.brush = QBrush(QColor(255, 255, 255), QtCore.Qt.BrushStyle(1))
+        # (宽, 高) -> (QPixmap, 源矩形)
+        self.sprites = {}
 
     def boundingRect(self):
         return self.rect
 
+    def sprite(self, width, height):
+        key = (width, height)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            return sprite
+        # 留出画笔的宽度
+        padding = self.pen.widthF()
+        pixmapWidth = math.ceil(width + padding * 2)
+        pixmapHeight = math.ceil(height + padding * 2)
+        pixmap = QPixmap(pixmapWidth, pixmapHeight)
+        pixmap.fill(QtCore.Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+        painter.drawEllipse(QtCore.QRectF((pixmapWidth - width) / 2, (pixmapHeight - height) / 2, width, height))
+        painter.end()
+        sprite = (pixmap, QtCore.QRectF(0, 0, pixmapWidth, pixmapHeight))
+        self.sprites[key] = sprite
+        return sprite
+
+    def capture(self, snapshot):
+        # 弹幕中心的场景坐标与尺寸
+        if kinematics.enabled:
+            snapshot.danmaku = kinematics.danmakuPositions(GROUND_RECT.x(), GROUND_RECT.y())
+            return
+        ids = []
+        xs = []
+        ys = []
+        widths = []
+        heights = []
+        for _, position, size in Component.components.query('danmaku', 'position', 'size'):
+            ids.append(position.id)
+            xs.append(position.x + GROUND_RECT.x())
+            ys.append(position.y + GROUND_RECT.y())
+            widths.append(size.width)
+            heights.append(size.height)
+        snapshot.danmaku = (ids, xs, ys, widths, heights)
+
     def paint(self, painter: QPainter):
-        danmakuComs = Component.components.get('danmaku')
-        if danmakuComs is None:
+        previous, snapshot, alpha = snapshots.frame()
+        if snapshot is None:
             return
-        for danmakuCom in danmakuComs:
-            danmaku = danmakuCom.danmaku
-            pos = danmaku.positionCom.position
-            size = danmaku.sizeCom
+        xs, ys = interpolate(previous and previous.danmaku, snapshot.danmaku, alpha, snapshot.destroyed)
+        widths, heights = snapshot.danmaku[3], snapshot.danmaku[4]
+        if GameDanmaku.batched:
+            self.paintBatched(painter, xs, ys, widths, heights)
+        else:
+            self.paintEach(painter, xs, ys, widths, heights)
+
+    def paintBatched(self, painter: QPainter, xs, ys, widths, heights):
+        create = QPainter.PixmapFragment.create
+        groups = {}
+        for x, y, width, height in zip(xs, ys, widths, heights):
+            group = groups.get((width, height))
+            if group is None:
+                group = groups[(width, height)] = []
+            group.append(QtCore.QPointF(x, y))
+        for (width, height), points in groups.items():
+            pixmap, source = self.sprite(width, height)
+            painter.drawPixmapFragments([ create(point, source) for point in points ], pixmap)
+
+    def paintEach(self, painter: QPainter, xs, ys, widths, heights):
+        for x, y, width, height in zip(xs, ys, widths, heights):
             painter.setPen(self.pen)
             painter.setBrush(self.brush)
-            x = pos.x() - size.width / 2
-            y = pos.y() - size.height / 2
-            painter.drawEllipse(x, y, size.width, size.height)
-
-class Enemy1(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 5, 80)
-        self.positionCom = PositionCom(self.id, -10, 50, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.06, 0)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 5)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=6, interval=10, five=15)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy2(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 5, 280)
-        self.positionCom = PositionCom(self.id, 550, 50, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.06, 0)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 5)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=6, interval=10, triple=15)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy3(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 10, 0)
-        self.positionCom = PositionCom(self.id, 267, -30, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.1, 90)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 100)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=12, interval=4, four=30)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy4(Entity):
-
-    def __init__(self, health=4) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 5, 90)
-        self.positionCom = PositionCom(self.id, -15, 30, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.1, 0)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, health)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=12, interval=4, four=30)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
+            painter.drawEllipse(QtCore.QRectF(x - width / 2, y - height / 2, width, height))
 
-class Enemy5(Entity):
+class Enemy(Entity):
+    """
+    敌人，组件按原型（archetype.Archetype）的数据生成，原型见 assets/enemies.json
+    """
 
-    def __init__(self, health=4) -> None:
+    def __init__(self, archetype, x, y, health) -> None:
         super().__init__()
+        self.archetype = archetype
         # 进行标记
         self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
+        if archetype.image is not None:
+            self.image = archetype.image
+        # 初始位置速度和加速度
         self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 5, 270)
-        self.positionCom = PositionCom(self.id, 560, 30, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.1, 0)
-        self.sizeCom = SizeCom(self.id, 32, 64)
+        self.velocityCom = VelocityCom(self.id, *archetype.velocity)
+        self.positionCom = PositionCom(self.id, x, y, True)
+        if archetype.acceleration is not None:
+            self.accelerationCom = AccelerationCom(self.id, *archetype.acceleration)
+        self.sizeCom = SizeCom(self.id, *archetype.size)
         self.healthCom = HealthCom(self.id, health)
         # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=12, interval=4, four=30)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy6(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 3, 0)
-        self.positionCom = PositionCom(self.id, 550, -30, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.1, 270)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 4)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=12, interval=4)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-
-class Enemy7(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 3, 80)
-        self.positionCom = PositionCom(self.id, 0, 50, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.1, 270)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 4)
-        # 初始化 shooterCom
-        self.shooterCom = RandomShooterCom(self, speed=5, interval=6)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy8(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 3, 280)
-        self.positionCom = PositionCom(self.id, 550, 50, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.1, 270)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 4)
-        # 初始化 shooterCom
-        self.shooterCom = RandomShooterCom(self, speed=5, interval=6)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy9(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 5, 0)
-        self.positionCom = PositionCom(self.id, 267, 0, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.05, 180)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 100)
-        # 初始化 shooterCom
-        self.shooterCom = RandomShooterCom(self, speed=5, interval=1, double=180)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy10(Entity):
-
-    def __init__(self, offsetX) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 4, 0)
-        self.positionCom = PositionCom(self.id, 267 + offsetX, 0, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.05, 180)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 100)
-        # 初始化 shooterCom
-        self.shooterCom = RandomShooterCom(self, speed=5, interval=1, double=180)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy11(Entity):
-
-    def __init__(self, offsetX) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 1, 0)
-        self.positionCom = PositionCom(self.id, 0, 5, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.04, 90)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 100)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=10, interval=5, five=90)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy12(Entity):
-
-    def __init__(self, index) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 0.8, 0)
-        self.positionCom = PositionCom(self.id, 20 + index * 50, 20, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.08, 45)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 3)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=10, interval=10, five=40)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy13(Entity):
-
-    def __init__(self, index) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 0.8, 0)
-        self.positionCom = PositionCom(self.id, 520 +- index * 50, 20, True)
-        self.accelerationCom = AccelerationCom(self.id, 0.08, 315)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 3)
-        # 初始化 shooterCom
-        self.shooterCom = PlayerShooterCom(self, speed=10, interval=10, five=20)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy14(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 0, 180)
-        self.positionCom = PositionCom(self.id, 275, 300, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.08, 315)
-        self.sizeCom = SizeCom(self.id, 32, 64)
-        self.healthCom = HealthCom(self.id, 100)
-        # 初始化 shooterCom
-        self.shooterCom = RotateShooterCom(self)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
-
-class Enemy15(Entity):
-
-    def __init__(self) -> None:
-        super().__init__()
-        # 进行标记
-        self.enemyCom = EnemyCom(self)
-        self.image = QImage('assets/bm2.png')
-        # 手动设置初始位置速度和加速度
-        self.moveCom = MoveCom(self.id)
-        self.velocityCom = VelocityCom(self.id, 0, 180)
-        self.positionCom = PositionCom(self.id, 275, 120, True)
-        # self.accelerationCom = AccelerationCom(self.id, 0.08, 315)
-        self.sizeCom = SizeCom(self.id, 64, 64)
-        self.healthCom = HealthCom(self.id, 600)
-        # 初始化 shooterCom
-        self.shooterCom = BoliShooterCom(self, 8, count=6, rotate1=1, rotate2=25)
-
-    def destroy(self):
-        Entity.entities.pop(self.id)
-
-        Component.components.get('enemy').remove(self.enemyCom)
-        Component.components.get('move').remove(self.moveCom)
-        Component.components.get('velocity').remove(self.velocityCom)
-        Component.components.get('position').remove(self.positionCom)
-        # Component.components.get('acceleration').remove(self.accelerationCom)
-        Component.components.get('size').remove(self.sizeCom)
-        Component.components.get('shooter').remove(self.shooterCom)
+        self.shooterCom = ShooterCom(self, archetype.pattern, **archetype.shooterParams)
 
 class Danmaku(Entity):
 
@@ -585,10 +467,35 @@ class Danmaku(Entity):
         self.velocityCom = VelocityCom(self.id, speed, direction)
         self.isCaed = False
 
+    @staticmethod
+    def spawn(x, y, speed, direction, size=15):
+        return danmakuPool.spawn(x, y, speed, direction, size)
+
+    @staticmethod
+    def spawnVolley(x, y, speed, directions, size=15):
+        # 一次射击的全部弹幕，组件批量加入
+        with Component.components.batch():
+            for direction in directions:
+                danmakuPool.spawn(x, y, speed, direction, size)
+
+    def reset(self, x, y, speed, direction, size=15):
+        self.speed = speed
+        for component in (self.danmakuCom, self.moveCom, self.positionCom, self.sizeCom, self.velocityCom):
+            component.attach()
+        self.moveCom.moving = True
+        self.positionCom.x = x
+        self.positionCom.y = y
+        self.positionCom.enableOut = True
+        self.sizeCom.width = size
+        self.sizeCom.height = size
+        self.velocityCom.defaultSpeed = speed
+        self.velocityCom.speed = speed
+        self.velocityCom.direction = direction
+        self.isCaed = False
+
     def destory(self):
-        Entity.entities.pop(self.id)
-        DanCom.components.get('danmaku').remove(self.danmakuCom)
-        DanCom.components.get('move').remove(self.moveCom)
-        DanCom.components.get('position').remove(self.positionCom)
-        DanCom.components.get('size').remove(self.sizeCom)
-        DanCom.components.get('velocity').remove(self.velocityCom)
+        self.destroy()
+
+# 对象池：空闲列表容量与同时存活的上限
+danPool = EntityPool(Dan, capacity=256, limit=512)
+danmakuPool = EntityPool(Danmaku, capacity=8192, limit=20000)
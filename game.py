@@ -1,17 +1,78 @@
-from gui import gui
-from world import world
+import os
+import argparse
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description='东方炸弹人')
+    parser.add_argument('--headless', action='store_true', help='不显示窗口、不播放声音，尽可能快地运行关卡')
+    parser.add_argument('--ticks', type=int, help='无界面模式运行的帧数，默认 4500，回放时为录像的长度')
+    parser.add_argument('--stage', type=int, default=0, help='无界面模式运行的关卡')
+    parser.add_argument('--immortal', action='store_true', help='无界面模式保持残机，不会因游戏结束提前停止')
+    parser.add_argument('--profile', action='store_true', help='记录每个系统与绘制回调的耗时')
+    parser.add_argument('--profile-csv', metavar='PATH', help='退出时把耗时统计写入 CSV')
+    parser.add_argument('--render-hz', type=float, default=120, help='渲染频率，高于 60 时在模拟帧之间插值')
+    parser.add_argument('--no-interpolation', action='store_true', help='只绘制最近一帧模拟的位置')
+    parser.add_argument('--seed', type=int, help='无界面模式的随机数种子，默认使用新的种子')
+    parser.add_argument('--record', metavar='PATH', help='记录最近一关的输入，退出时保存')
+    parser.add_argument('--replay', metavar='PATH', help='回放录像，无界面模式下全速运行')
+    parser.add_argument('--hash', metavar='PATH', help='记录最近一关每帧状态的哈希，退出时保存，见 determinism.py')
+    return parser.parse_args()
 
 def init():
     world.init()
 
 def start():
-    world.gameStarter()
-    world.start()
+    if world.replay is not None:
+        # 回放时跳过标题界面，直接开始录像中的关卡
+        world.gameStart(world.replay.stage)
+    else:
+        world.gameStarter()
+        world.start()
     gui.start(exit)
 
 def exit():
     world.running = False
+    if world.recorder is not None:
+        world.recorder.save(world.recordPath)
+        print('recorded %d ticks (seed %d) -> %s' % (len(world.recorder), world.recorder.seed, world.recordPath))
+    if world.hasher is not None:
+        world.hasher.save(world.hashPath)
+        print('hashed %d ticks -> %s' % (len(world.hasher.log), world.hashPath))
+    profiler.dump(store=Component.components)
+
+def simulate(ticks, stage, seed=None, immortal=False):
+    count, elapsed = world.simulate(ticks, stage, seed, immortal)
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print('ticks: %d, elapsed: %.3fs, ticks/sec: %.1f' % (count, elapsed, rate))
+    if profiler.enabled:
+        print('\n'.join(profiler.format(Component.components) + EntityPool.format() + assets.format()))
+    exit()
 
 if __name__ == '__main__':
+    args = parseArgs()
+    if args.headless:
+        # gui 在导入时创建，需要在导入前设置
+        os.environ['TOUHOU_HEADLESS'] = '1'
+    from gui import gui
+    from world import world
+    from components import Component
+    from entities import EntityPool
+    from profiler import profiler
+    from assets import assets
+    profiler.enabled = args.profile or args.profile_csv is not None
+    profiler.csvPath = args.profile_csv
+    from snapshot import snapshots
+    snapshots.interpolation = not args.no_interpolation
+    world.renderInterval = 1 / args.render_hz
+    from replay import InputLog
+    world.recordPath = args.record
+    world.hashPath = args.hash
+    if args.replay is not None:
+        world.replay = InputLog.load(args.replay)
     init()
-    start()
+    if args.headless:
+        if world.replay is not None:
+            simulate(args.ticks or len(world.replay), world.replay.stage, immortal=args.immortal)
+        else:
+            simulate(args.ticks or 4500, args.stage, args.seed, args.immortal)
+    else:
+        start()
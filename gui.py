@@ -1,4 +1,7 @@
-from PyQt5 import QtCore, QtGui, QtMultimedia
+import os
+
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtGui import QRegion
 from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
 
 
@@ -9,8 +12,16 @@ from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
 1. 控制窗口显示 API
 2. 提供键盘事件的订阅
 3. 提供物品绘制隐藏的接口
+
+环境变量 TOUHOU_HEADLESS=1 时使用 HeadlessGui：不创建 QApplication 和窗口，用于无显示器的环境
+
+update() 只重绘变化的区域：每个绘制物品的 changed() 返回本帧是否需要重绘，
+游戏区域每帧都会变化，HUD 只在数值改变时变化，静止的背景只在加入场景时绘制一次。
+repaintedArea / totalArea 统计每帧重绘的面积。
 """
 
+HEADLESS = os.environ.get('TOUHOU_HEADLESS') == '1'
+
 class GameScene(QGraphicsScene):
 
     def __init__(self, gui):
@@ -24,9 +35,32 @@ class GameScene(QGraphicsScene):
         self.gui.triggerKeyReleaseEvent(event)
 
 
-class Gui(QApplication):
+class KeySubscription:
+
+    def subscribe(self, subscriptor) -> None:
+        self.subscriptors.append(subscriptor)
+
+    def unSubscribe(self, subscriptor) -> None:
+        try:
+            self.subscriptors.remove(subscriptor)
+        except:
+            pass
+
+    def triggerKeyPressEvent(self, event: QtGui.QKeyEvent) -> None:
+        for sub in self.subscriptors:
+            if hasattr(sub, 'keyPressEvent'):
+                sub.keyPressEvent(event)
+
+    def triggerKeyReleaseEvent(self, event: QtGui.QKeyEvent) -> None:
+        for sub in self.subscriptors:
+            if hasattr(sub, 'keyReleaseEvent'):
+                sub.keyReleaseEvent(event)
+
+
+class Gui(KeySubscription, QApplication):
 
     instance = None
+    headless = False
 
     def __init__(self) -> None:
         super().__init__([])
@@ -36,44 +70,86 @@ class Gui(QApplication):
         self.subscriptors = []
         self.view.setFixedSize(960, 720)
         self.view.setWindowTitle('东方炸弹人 ～ Touhou Bomberman')
+        # 只重绘 update() 给出的区域；物品的绘制不超出 boundingRect，不需要为抗锯齿扩大区域
+        self.view.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        self.view.setOptimizationFlag(QGraphicsView.DontAdjustForAntialiasing)
         self._exit = None
+        self.items = set()
+        # 重绘统计：帧数、最近一帧与累计的重绘面积（像素）
+        self.frames = 0
+        self.repaintedArea = 0
+        self.totalArea = 0
 
     def start(self, exit) -> None:
         self.view.show()
         self._exit = exit
         self.exec()
-        self._exit()
+        self.finish()
 
     def addGraphicsItem(self, item) -> None:
         self.scene.addItem(item)
+        self.items.add(item)
 
     def removeGraphicsItem(self, item) -> None:
         self.scene.removeItem(item)
+        self.items.discard(item)
 
     def update(self) -> None:
-        self.scene.update()
+        # 合并所有变化的物品的区域，重复的区域只更新一次
+        region = QRegion()
+        for item in tuple(self.items):
+            if item.changed():
+                region = region.united(item.sceneBoundingRect().toAlignedRect())
+        area = 0
+        for rect in region.rects():
+            self.scene.update(QtCore.QRectF(rect))
+            area += rect.width() * rect.height()
+        self.frames += 1
+        self.repaintedArea = area
+        self.totalArea += area
+
+    def format(self):
+        size = self.scene.width() * self.scene.height()
+        average = self.totalArea / self.frames if self.frames else 0
+        return [ 'repaint %6d px %5.1f%%  avg %5.1f%%' % (self.repaintedArea, self.repaintedArea / size * 100, average / size * 100) ]
 
-    def subscribe(self, subscriptor) -> None:
-        self.subscriptors.append(subscriptor)
+    def exit(self):
+        self.closeAllWindows()
+        self.finish()
 
-    def unSubscribe(self, subscriptor) -> None:
-        try:
-            self.subscriptors.remove(subscriptor)
-        except:
-            pass
+    def finish(self):
+        # 退出回调只调用一次：exit() 关闭窗口后 exec() 返回，start() 中不再调用
+        exit, self._exit = self._exit, None
+        if exit is not None:
+            exit()
 
-    def triggerKeyPressEvent(self, event: QtGui.QKeyEvent) -> None:
-        for sub in self.subscriptors:
-            if hasattr(sub, 'keyPressEvent'):
-                sub.keyPressEvent(event)
 
-    def triggerKeyReleaseEvent(self, event: QtGui.QKeyEvent) -> None:
-        for sub in self.subscriptors:
-            if hasattr(sub, 'keyReleaseEvent'):
-                sub.keyReleaseEvent(event)
+class HeadlessGui(KeySubscription):
+
+    headless = True
+
+    def __init__(self) -> None:
+        self.subscriptors = []
+        self._exit = None
+
+    def start(self, exit) -> None:
+        self._exit = exit
+
+    def addGraphicsItem(self, item) -> None:
+        pass
+
+    def removeGraphicsItem(self, item) -> None:
+        pass
+
+    def update(self) -> None:
+        pass
+
+    def format(self):
+        return []
 
     def exit(self):
-        self.closeAllWindows()
-        self._exit()
+        exit, self._exit = self._exit, None
+        if exit is not None:
+            exit()
 
-gui = Gui()
+gui = HeadlessGui() if HEADLESS else Gui()
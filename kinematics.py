@@ -0,0 +1,245 @@
+"""
+向量化运动学
+
+启用后，每个带有运动相关组件（位置、速度、尺寸、移动、加速度）的实体在 Kinematics 中占一行，
+各个字段保存为连续的 NumPy 数组。MoveSys / AccelerationSys / DanmakuManageSys 每帧只做若干次数组运算。
+启用时组件实例化为 vectorize() 生成的子类，其属性通过 KinematicField 读写实体所在的行，
+原有按组件访问的写法不变；未启用时组件仍是普通属性，没有额外开销。
+
+删除实体时把最后一行移动到被删除的位置（swap-and-pop），批量删除大量实体时整体压缩。
+未安装 NumPy 时不启用，各个系统退回逐实体计算。
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VALUES = ('x', 'y', 'speed', 'direction', 'ux', 'uy', 'acceleration', 'accelerationDirection', 'accelerationUx', 'accelerationUy', 'baseSpeed', 'width', 'height')
+FLAGS = ('enableOut', 'movable', 'moving', 'accelerated', 'danmaku')
+
+class KinematicsRow:
+
+    __slots__ = ('buffer', 'slot', 'id')
+
+    def __init__(self, buffer, slot, id) -> None:
+        self.buffer = buffer
+        self.slot = slot
+        self.id = id
+
+class KinematicField:
+    """
+    组件属性：读写实体所在行的 column 列
+    """
+
+    def __init__(self, column) -> None:
+        self.column = column
+
+    def __get__(self, component, owner=None):
+        if component is None:
+            return self
+        row = component._row
+        return getattr(row.buffer, self.column)[row.slot]
+
+    def __set__(self, component, val):
+        row = component._row
+        getattr(row.buffer, self.column)[row.slot] = val
+
+class Kinematics:
+
+    def __init__(self, capacity=1024) -> None:
+        self.enabled = np is not None
+        self.rows = {}
+        self.handles = []
+        self.count = 0
+        self.classes = {}
+        if np is not None:
+            self.allocate(capacity)
+
+    def enable(self, flag):
+        if flag and np is None:
+            raise RuntimeError('vectorized kinematics requires numpy')
+        if self.count > 0:
+            raise RuntimeError('kinematics mode can only change while no entity is alive')
+        self.enabled = flag
+
+    def vectorize(self, cls):
+        # 生成组件的向量化子类，cls.fields 中的属性改为读写实体所在行
+        vectorized = self.classes.get(cls)
+        if vectorized is None:
+            namespace = { name: KinematicField(column) for name, column in cls.fields.items() }
+            vectorized = type(cls.__name__, (cls,), namespace)
+            self.classes[cls] = vectorized
+        return vectorized
+
+    def allocate(self, capacity):
+        values = np.zeros((capacity, len(VALUES)), dtype=np.float64, order='F')
+        flags = np.zeros((capacity, len(FLAGS)), dtype=np.bool_, order='F')
+        ids = np.zeros(capacity, dtype=np.int64)
+        if self.count > 0:
+            values[:self.count] = self.values[:self.count]
+            flags[:self.count] = self.flags[:self.count]
+            ids[:self.count] = self.ids[:self.count]
+        self.values = values
+        self.flags = flags
+        self.ids = ids
+        self.capacity = capacity
+        # 列是 Fortran 顺序数组的切片，每一列在内存中连续
+        for index, name in enumerate(VALUES):
+            setattr(self, name, values[:, index])
+        for index, name in enumerate(FLAGS):
+            setattr(self, name, flags[:, index])
+
+    def attach(self, id):
+        # 组件创建时取得实体所在行，同一实体的组件共享一行
+        row = self.rows.get(id)
+        if row is not None:
+            return row
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+        slot = self.count
+        self.values[slot] = 0
+        self.flags[slot] = False
+        self.ids[slot] = id
+        row = KinematicsRow(self, slot, id)
+        self.rows[id] = row
+        self.handles.append(row)
+        self.count += 1
+        return row
+
+    def release(self, id):
+        row = self.rows.pop(id, None)
+        if row is None:
+            return
+        self.releaseRow(row)
+
+    def releaseMany(self, ids):
+        # 删除的行超过一半时整体压缩，否则逐行 swap-and-pop
+        rows = []
+        for id in ids:
+            row = self.rows.pop(id, None)
+            if row is not None:
+                rows.append(row)
+        if not rows:
+            return
+        if len(rows) * 2 < self.count:
+            for row in rows:
+                self.releaseRow(row)
+            return
+        n = self.count
+        keep = np.ones(n, dtype=np.bool_)
+        keep[[ row.slot for row in rows ]] = False
+        slots = np.flatnonzero(keep)
+        count = slots.size
+        self.values[:count] = self.values[slots]
+        self.flags[:count] = self.flags[slots]
+        self.ids[:count] = self.ids[slots]
+        handles = self.handles
+        handles[:] = [ handles[slot] for slot in slots.tolist() ]
+        for slot, row in enumerate(handles):
+            row.slot = slot
+        for row in rows:
+            row.buffer = None
+        self.count = count
+
+    def releaseRow(self, row):
+        slot = row.slot
+        last = self.count - 1
+        moved = self.handles.pop()
+        if moved is not row:
+            self.values[slot] = self.values[last]
+            self.flags[slot] = self.flags[last]
+            self.ids[slot] = self.ids[last]
+            self.handles[slot] = moved
+            moved.slot = slot
+        # 已释放的行不能再读写
+        row.buffer = None
+        self.count = last
+
+    def clear(self):
+        self.rows.clear()
+        self.handles.clear()
+        self.count = 0
+
+    def accelerate(self):
+        n = self.count
+        if n == 0:
+            return
+        index = np.flatnonzero(self.accelerated[:n])
+        if index.size == 0:
+            return
+        speed = self.speed[index]
+        direction = self.direction[index]
+        velocityX = self.ux[index] * speed
+        velocityY = self.uy[index] * speed
+        accelerationX = self.accelerationUx[index] * self.acceleration[index]
+        accelerationY = self.accelerationUy[index] * self.acceleration[index]
+        x = velocityX + accelerationX
+        y = velocityY + accelerationY
+        with np.errstate(divide='ignore', invalid='ignore'):
+            angle = np.round(np.arctan(x / y) * 180 / np.pi, 2)
+        # 与逐实体计算相同：y == 0 时保持方向，x == 0 时取 0 或 180
+        angle = np.where(x == 0, np.where(y > 0, 0.0, 180.0), angle)
+        direction = np.where(y == 0, direction, angle)
+        self.speed[index] = np.round((x ** 2 + y ** 2) ** 0.5, 2)
+        self.direction[index] = direction
+        # 只有加速的实体需要重新计算单位向量
+        radians = np.radians(direction)
+        self.ux[index] = np.round(np.sin(radians), 2)
+        self.uy[index] = np.round(np.cos(radians), 2)
+
+    def move(self, width, height):
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        speed = self.speed[:n]
+        active = self.movable[:n] & self.moving[:n]
+        stepping = active & (speed != 0)
+        x += np.where(stepping, self.ux[:n] * speed, 0.0)
+        y += np.where(stepping, self.uy[:n] * speed, 0.0)
+        # enableOut=False 的实体限制在场地内
+        clamp = stepping & ~self.enableOut[:n]
+        if clamp.any():
+            right = width - self.width[:n]
+            bottom = height - self.height[:n]
+            np.copyto(x, np.where(x < 0, 0.0, np.where(x > right, right, x)), where=clamp)
+            np.copyto(y, np.where(y < 0, 0.0, np.where(y > bottom, bottom, y)), where=clamp)
+        # 弹幕速度衰减到初速度的 80%
+        decay = active & self.danmaku[:n] & (self.baseSpeed[:n] * 0.8 < speed)
+        speed[decay] *= 0.99
+
+    def danmakuCenters(self, offsetX, offsetY):
+        # 弹幕实体 id、中心坐标（加上场地偏移）与最大半宽、半高
+        n = self.count
+        slots = np.flatnonzero(self.danmaku[:n])
+        halfWidth = self.width[slots] / 2
+        halfHeight = self.height[slots] / 2
+        xs = self.x[slots] + offsetX + halfWidth
+        ys = self.y[slots] + offsetY + halfHeight
+        if slots.size == 0:
+            return self.ids[slots], xs, ys, 0, 0
+        return self.ids[slots], xs, ys, float(halfWidth.max()), float(halfHeight.max())
+
+    def danmakuPositions(self, offsetX, offsetY):
+        # 弹幕的实体 id、位置（加上场地偏移）与尺寸，用于绘制
+        n = self.count
+        slots = np.flatnonzero(self.danmaku[:n])
+        xs = self.x[slots] + offsetX
+        ys = self.y[slots] + offsetY
+        return self.ids[slots].tolist(), xs.tolist(), ys.tolist(), self.width[slots].tolist(), self.height[slots].tolist()
+
+    def outsideDanmaku(self, width, height):
+        # 返回离开场地的弹幕实体 id
+        n = self.count
+        if n == 0:
+            return []
+        x = self.x[:n]
+        y = self.y[:n]
+        halfWidth = self.width[:n] / 2
+        halfHeight = self.height[:n] / 2
+        outside = (x > width + halfWidth) | (y > height + halfHeight) | (x < -halfWidth) | (y < -halfHeight)
+        return self.ids[:n][outside & self.danmaku[:n]].tolist()
+
+kinematics = Kinematics()
@@ -0,0 +1,140 @@
+"""
+弹幕模式
+
+射击组件（ShooterCom）只保存速度、间隔、冷却与模式的状态，每次射击发出的一组弹幕由模式决定。
+模式在 assets/enemies.json 的 shooter.pattern 中用数据描述，加载原型时编译为程序对象，同一原型的敌人共享。
+程序的 emit(shooter, player, rng) 返回一次射击的全部方向，随机方向来自 rng（即 world.random，由种子决定），EnemyShootSys 把整组方向交给 Danmaku.spawnVolley 一次生成。
+
+    { "type": "fan", "count": n, "spread": 角度, "source": 中心方向 }
+        扇形，第 i 发的偏移为 (i - (n - 1) / 2) * spread
+        source 为数字（固定方向）、"player"（朝向自机）或 "random"（随机的整数方向），默认 0
+    { "type": "aimed" }                                 朝向自机的单发
+    { "type": "random" }                                随机方向的单发
+    { "type": "ring", "count": n, "start": 角度 }       均匀的一圈
+    { "type": "rotating", "count": n, "step": 角度 }    每次射击旋转 step 的一圈
+    { "type": "boli", "count": n, "rotate1": 相位速度, "rotate2": 幅度 }
+                                                        旋转速度按正弦变化的一圈
+    { "type": "compose", "patterns": [ ... ] }          依次发出各个模式
+
+扇形的偏移与原来的 triple / five / double / four 写法逐位相同：
+奇数发为 整数 * spread，偶数发为 奇数 * spread / 2，中心一发直接使用中心方向。
+"""
+
+import abc
+import math
+
+class Program(metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def emit(self, shooter, player, rng):
+        # 返回一次射击的全部方向
+        pass
+
+class Fan(Program):
+
+    def __init__(self, count=1, spread=0, source=0) -> None:
+        self.count = count
+        self.spread = spread
+        self.source = source
+        self.offsets = []
+        for i in range(count):
+            k = 2 * i - (count - 1)
+            self.offsets.append(k // 2 * spread if count % 2 else k * spread / 2)
+
+    def center(self, shooter, player, rng):
+        source = self.source
+        if source == 'player':
+            return aim(shooter, player)
+        if source == 'random':
+            return rng.randrange(0, 360)
+        return source
+
+    def emit(self, shooter, player, rng):
+        direction = self.center(shooter, player, rng)
+        return [ direction + offset if offset else direction for offset in self.offsets ]
+
+def aim(shooter, player):
+    # 朝向自机；保留 atan(dX / dY) 的结果（自机在上方时方向与原来相同），dY 为 0 时水平朝向自机
+    pos = shooter.posCom.position
+    x = pos.x()
+    y = pos.y()
+    pX = player.positionCom.position.x() + 16
+    pY = player.positionCom.position.y() + 24
+    dX = pX - x
+    dY = pY - y
+    if dY != 0:
+        return round(math.atan(dX / dY) * 180 / math.pi, 2)
+    if dX > 0:
+        return 90.0
+    if dX < 0:
+        return -90.0
+    return 0.0
+
+class Ring(Program):
+
+    def __init__(self, count=6, start=0) -> None:
+        self.count = count
+        self.start = start
+        self.average = 360 / count
+
+    def emit(self, shooter, player, rng):
+        return ring(self.start, self.average, self.count)
+
+def ring(start, average, count):
+    return [ start - i * average for i in range(count) ]
+
+class Rotating(Ring):
+
+    def __init__(self, count=6, step=3, start=0) -> None:
+        super().__init__(count, start)
+        self.step = step
+
+    def emit(self, shooter, player, rng):
+        current = shooter.state.get(self, self.start)
+        shooter.state[self] = current + self.step
+        return ring(current, self.average, self.count)
+
+class Boli(Ring):
+
+    def __init__(self, count=8, rotate1=2, rotate2=10, start=0) -> None:
+        super().__init__(count, start)
+        self.rotate1 = rotate1
+        self.rotate2 = rotate2
+
+    def emit(self, shooter, player, rng):
+        # 状态：(当前方向, 正弦的相位)
+        current, phase = shooter.state.get(self, (self.start, 0))
+        phase += self.rotate1
+        directions = ring(current, self.average, self.count)
+        shooter.state[self] = (current + self.rotate2 * math.sin(math.radians(phase)), phase)
+        return directions
+
+class Compose(Program):
+
+    def __init__(self, programs) -> None:
+        self.programs = programs
+
+    def emit(self, shooter, player, rng):
+        directions = []
+        for program in self.programs:
+            directions.extend(program.emit(shooter, player, rng))
+        return directions
+
+def compilePattern(spec):
+    spec = dict(spec)
+    type = spec.pop('type')
+    if type == 'fan':
+        return Fan(**spec)
+    if type == 'aimed':
+        return Fan(source='player')
+    if type == 'random':
+        return Fan(source='random')
+    if type == 'ring':
+        return Ring(**spec)
+    if type == 'rotating':
+        return Rotating(**spec)
+    if type == 'boli':
+        return Boli(**spec)
+    if type == 'compose':
+        return Compose([ compilePattern(pattern) for pattern in spec['patterns'] ])
+    raise ValueError('未知的弹幕模式：%s' % type)
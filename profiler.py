@@ -0,0 +1,121 @@
+"""
+性能统计
+
+记录每个 System 每帧 nextTick 的耗时、每个绘制回调（PaintGraphicsItem）的耗时，
+每个名字对应一个固定长度的环形缓冲区，只保留最近 size 个样本，用于计算 p50 / p95 / p99。
+
+enabled 为 False 时不计时。overlay 控制游戏内是否显示统计，csvPath 不为 None 时退出游戏写出 CSV。
+"""
+
+import csv
+import math
+import timeit
+
+clock = timeit.default_timer
+
+class RingBuffer:
+
+    def __init__(self, size) -> None:
+        self.size = size
+        self.samples = []
+        self.next = 0
+        self.total = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def append(self, value):
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            self.samples[self.next] = value
+        self.next = (self.next + 1) % self.size
+        self.total += 1
+
+    def percentiles(self, *ranks):
+        # 最近邻法
+        if not self.samples:
+            return [ 0 for _ in ranks ]
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return [ ordered[min(last, max(0, math.ceil(rank / 100 * len(ordered)) - 1))] for rank in ranks ]
+
+class Profiler:
+
+    def __init__(self, size=600) -> None:
+        self.size = size
+        self.enabled = False
+        self.overlay = False
+        self.csvPath = None
+        # 名字 -> RingBuffer，保持首次记录的顺序
+        self.buffers = {}
+
+    def record(self, name, seconds):
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = RingBuffer(self.size)
+        buffer.append(seconds)
+
+    def clear(self):
+        self.buffers.clear()
+
+    def toggleOverlay(self):
+        # 显示统计时开始计时
+        self.overlay = not self.overlay
+        if self.overlay:
+            self.enabled = True
+
+    def report(self):
+        # [(名字, 样本数, p50, p95, p99)]，单位为毫秒
+        rows = []
+        # 绘制线程读取时模拟线程可能正在加入新的统计项
+        for name, buffer in list(self.buffers.items()):
+            p50, p95, p99 = buffer.percentiles(50, 95, 99)
+            rows.append((name, len(buffer), p50 * 1000, p95 * 1000, p99 * 1000))
+        return rows
+
+    @staticmethod
+    def entityCounts(store):
+        # 每种组件的数量
+        return { type: len(array) for type, array in store.items() }
+
+    def format(self, store=None):
+        lines = [ '%-24s %8s %8s %8s' % ('ms', 'p50', 'p95', 'p99') ]
+        for name, _, p50, p95, p99 in self.report():
+            lines.append('%-24s %8.3f %8.3f %8.3f' % (name, p50, p95, p99))
+        if store is not None:
+            lines += self.formatCounts(self.entityCounts(store))
+        return lines
+
+    @staticmethod
+    def formatCounts(counts, width=None):
+        # 每种组件一行；指定 width 时多种组件写在一行，每行不超过 width 个字符
+        if width is None:
+            return [ '%-24s %8d' % (type, count) for type, count in counts.items() ]
+        lines = []
+        line = ''
+        for type, count in counts.items():
+            item = '%s %d' % (type, count)
+            if line and len(line) + 2 + len(item) > width:
+                lines.append(line)
+                line = item
+            else:
+                line = line + '  ' + item if line else item
+        if line:
+            lines.append(line)
+        return lines
+
+    def dump(self, path=None, store=None):
+        path = path or self.csvPath
+        if path is None:
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'samples', 'p50_ms', 'p95_ms', 'p99_ms'])
+            for row in self.report():
+                writer.writerow(row)
+            if store is not None:
+                for type, count in self.entityCounts(store).items():
+                    writer.writerow(['count:' + type, count, '', '', ''])
+
+profiler = Profiler()
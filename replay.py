@@ -0,0 +1,119 @@
+"""
+输入录像
+
+PlayerSys 在每帧开始时锁存方向键、Shift、Z、X 的状态（INPUT_KEYS 中第 i 个键为第 i 位），
+InputLog 只保存状态改变的帧，加上关卡与随机数种子，就可以在同样的关卡中重现整局游戏。
+
+文件格式（小端）：
+
+    MAGIC | 版本 uint8 | 关卡 uint8 | 种子 uint32 | 帧数 uint32 | zlib(变化列表)
+
+变化列表中每项为 距上一次变化的帧数（varint）与新的状态（uint8）。
+
+    python game.py --record run.rep                       # 游玩并录像，退出时保存
+    python game.py --replay run.rep                       # 在窗口中回放
+    python game.py --headless --replay run.rep --profile  # 无界面全速回放并统计耗时
+"""
+
+import zlib
+import struct
+
+from PyQt5.QtCore import Qt
+
+MAGIC = b'THRP'
+VERSION = 1
+HEADER = struct.Struct('<4sBBII')
+
+# 录像的按键；同一帧有多个键变化时，先按这个顺序处理松开，再按这个顺序处理按下
+INPUT_KEYS = [ Qt.Key_Left, Qt.Key_Right, Qt.Key_Up, Qt.Key_Down, Qt.Key_Shift, Qt.Key_Z, Qt.Key_X ]
+INPUT_BITS = { key: 1 << i for i, key in enumerate(INPUT_KEYS) }
+
+def transitions(previous, mask):
+    # 从 previous 到 mask 的按键变化 [(键, 是否按下)]
+    changed = previous ^ mask
+    if not changed:
+        return []
+    releases = [ (key, False) for key in INPUT_KEYS if changed & INPUT_BITS[key] and not mask & INPUT_BITS[key] ]
+    presses = [ (key, True) for key in INPUT_KEYS if changed & INPUT_BITS[key] and mask & INPUT_BITS[key] ]
+    return releases + presses
+
+class InputLog:
+
+    def __init__(self, stage=0, seed=0) -> None:
+        self.stage = stage
+        self.seed = seed
+        # [(帧, 状态)]，只包含状态改变的帧
+        self.changes = []
+        self.ticks = 0
+        self.last = 0
+        # 回放的位置
+        self._cursor = 0
+        self._mask = 0
+        self._tick = -1
+
+    def __len__(self):
+        return self.ticks
+
+    def record(self, tick, mask):
+        if mask != self.last:
+            self.changes.append((tick, mask))
+            self.last = mask
+        self.ticks = tick + 1
+
+    def mask(self, tick):
+        # 第 tick 帧的状态，按帧递增读取时为 O(1)，回到之前的帧时从头开始
+        if tick < self._tick:
+            self._cursor = 0
+            self._mask = 0
+        self._tick = tick
+        changes = self.changes
+        while self._cursor < len(changes) and changes[self._cursor][0] <= tick:
+            self._mask = changes[self._cursor][1]
+            self._cursor += 1
+        return self._mask
+
+    def encode(self):
+        body = bytearray()
+        previous = 0
+        for tick, mask in self.changes:
+            delta = tick - previous
+            previous = tick
+            while delta >= 0x80:
+                body.append(delta & 0x7f | 0x80)
+                delta >>= 7
+            body.append(delta)
+            body.append(mask)
+        return HEADER.pack(MAGIC, VERSION, self.stage, self.seed, self.ticks) + zlib.compress(bytes(body), 9)
+
+    @staticmethod
+    def decode(data):
+        magic, version, stage, seed, ticks = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('录像格式不正确')
+        log = InputLog(stage, seed)
+        body = zlib.decompress(data[HEADER.size:])
+        tick = 0
+        i = 0
+        while i < len(body):
+            delta = 0
+            shift = 0
+            while body[i] & 0x80:
+                delta |= (body[i] & 0x7f) << shift
+                shift += 7
+                i += 1
+            delta |= body[i] << shift
+            tick += delta
+            log.changes.append((tick, body[i + 1]))
+            i += 2
+        log.ticks = ticks
+        log.last = log.changes[-1][1] if log.changes else 0
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode())
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return InputLog.decode(f.read())
@@ -0,0 +1,122 @@
+"""
+绘制快照
+
+模拟线程在每帧末尾生成一份 RenderSnapshot 并发布，发布后不再修改。
+Qt 的绘制回调只读取最近发布的快照，不访问组件，因此不会读到模拟进行到一半的状态，也不会在绘制时推进模拟。
+
+SnapshotBuffer 保留最近两份快照（上一帧与当前帧），发布只替换一个元组引用，读取方一次取得两份快照。
+快照的内容由各个绘制者的 capture(snapshot) 填写，坐标均为场景坐标。
+
+渲染插值：WorldRunner 渲染前调用 present(alpha)，alpha 为累积的未模拟时间占一帧的比例，
+绘制时按实体 id 在上一帧与当前帧的位置之间插值，渲染频率因此可以高于模拟频率。
+一帧内移动超过 SNAP_DISTANCE 的实体（复活）与本帧销毁后由对象池以相同 id 重新生成的实体直接画在当前位置。
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SNAP_DISTANCE = 64
+
+class RenderSnapshot:
+
+    def __init__(self, tick) -> None:
+        self.tick = tick
+        # 弹幕：(ids, xs, ys, widths, heights)，(xs, ys) 为中心
+        self.danmaku = ((), (), (), (), ())
+        # 自机子弹：(ids, xs, ys)，(xs, ys) 为左上角
+        self.dans = ((), (), ())
+        # 敌人：[(id, x, y, width, height, image)]，(x, y) 为中心，image 为 None 时使用默认图片
+        self.enemies = []
+        # 自机：(x, y, image, invincible, reviveTime, bombY, lowSpeed)，(x, y) 为左上角
+        self.player = None
+        # 性能统计（按 P 显示时才记录）：组件类型 -> 数量，以及对象池等预先格式化的行
+        self.counts = {}
+        self.stats = []
+        # 本帧 commands.flush() 删除的实体 id，仍出现在本帧的为对象池复用的新实体，不插值
+        self.destroyed = {}
+
+class SnapshotBuffer:
+
+    def __init__(self) -> None:
+        # (上一帧, 当前帧)
+        self.frames = (None, None)
+        # 最近一次渲染使用的 (上一帧, 当前帧, alpha)
+        self.presented = None
+        self.interpolation = True
+
+    @property
+    def current(self):
+        return self.frames[1]
+
+    @property
+    def previous(self):
+        return self.frames[0]
+
+    def publish(self, snapshot):
+        self.frames = (self.frames[1], snapshot)
+
+    def present(self, alpha=1.0):
+        previous, current = self.frames
+        if not self.interpolation:
+            alpha = 1.0
+        self.presented = (previous, current, min(max(alpha, 0.0), 1.0))
+
+    def frame(self):
+        # 绘制使用的 (上一帧, 当前帧, alpha)，没有渲染过时直接使用当前帧
+        presented = self.presented
+        if presented is None or presented[1] is None:
+            return (None, self.frames[1], 1.0)
+        return presented
+
+    def clear(self):
+        self.frames = (None, None)
+        self.presented = None
+
+def lerp(previous, current, alpha):
+    if abs(current - previous) > SNAP_DISTANCE:
+        return current
+    return previous + (current - previous) * alpha
+
+def interpolate(previous, current, alpha, snap=()):
+    # previous / current 为 (ids, xs, ys, ...)，返回当前帧每个实体插值后的 (xs, ys)，snap 中的 id 不插值
+    ids, xs, ys = current[0], current[1], current[2]
+    if previous is None or alpha >= 1 or not ids:
+        return xs, ys
+    previousIds, previousXs, previousYs = previous[0], previous[1], previous[2]
+    if not previousIds:
+        return xs, ys
+    if np is not None and len(ids) > 64:
+        ids = np.asarray(ids)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        order = np.argsort(previousIds, kind='stable')
+        sortedIds = np.asarray(previousIds)[order]
+        index = np.minimum(np.searchsorted(sortedIds, ids), sortedIds.size - 1)
+        found = sortedIds[index] == ids
+        index = order[index]
+        fromX = np.asarray(previousXs, dtype=np.float64)[index]
+        fromY = np.asarray(previousYs, dtype=np.float64)[index]
+        blend = found & (np.abs(xs - fromX) <= SNAP_DISTANCE) & (np.abs(ys - fromY) <= SNAP_DISTANCE)
+        if snap:
+            blend &= ~np.isin(ids, np.fromiter(snap, dtype=ids.dtype, count=len(snap)))
+        xs = np.where(blend, fromX + (xs - fromX) * alpha, xs)
+        ys = np.where(blend, fromY + (ys - fromY) * alpha, ys)
+        return xs.tolist(), ys.tolist()
+    lookup = { id: index for index, id in enumerate(previousIds) }
+    resultX = []
+    resultY = []
+    for id, x, y in zip(ids, xs, ys):
+        index = lookup.get(id)
+        if index is not None and id not in snap:
+            fromX = previousXs[index]
+            fromY = previousYs[index]
+            if abs(x - fromX) <= SNAP_DISTANCE and abs(y - fromY) <= SNAP_DISTANCE:
+                x = fromX + (x - fromX) * alpha
+                y = fromY + (y - fromY) * alpha
+        resultX.append(x)
+        resultY.append(y)
+    return resultX, resultY
+
+snapshots = SnapshotBuffer()
@@ -0,0 +1,77 @@
+"""
+均匀网格空间索引
+
+覆盖场地的均匀网格，每帧用点坐标重建，查询时只返回与矩形范围相交的格子中的点。
+点以插入顺序的下标表示，查询结果按下标升序返回，调用方可以按原有遍历顺序处理。
+
+坐标为 NumPy 数组时用排序重建（按格子编号稳定排序后二分查找每一行格子），否则逐点放入格子列表。
+场地外的点归入最近的边缘格子，查询范围同样截断到场地内，因此不会漏掉任何点。
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class SpatialGrid:
+
+    def __init__(self, x, y, width, height, cellSize=64) -> None:
+        self.x = x
+        self.y = y
+        self.cellSize = cellSize
+        self.columns = math.ceil(width / cellSize)
+        self.rows = math.ceil(height / cellSize)
+        self.cells = [ [] for _ in range(self.columns * self.rows) ]
+        self.used = []
+        self.order = None
+        self.keys = None
+
+    def column(self, x):
+        column = int((x - self.x) // self.cellSize)
+        return min(max(column, 0), self.columns - 1)
+
+    def row(self, y):
+        row = int((y - self.y) // self.cellSize)
+        return min(max(row, 0), self.rows - 1)
+
+    def clear(self):
+        for cell in self.used:
+            self.cells[cell].clear()
+        self.used.clear()
+        self.order = None
+        self.keys = None
+
+    def rebuild(self, xs, ys):
+        self.clear()
+        if np is not None and isinstance(xs, np.ndarray):
+            columns = np.clip((xs - self.x) // self.cellSize, 0, self.columns - 1).astype(np.int64)
+            rows = np.clip((ys - self.y) // self.cellSize, 0, self.rows - 1).astype(np.int64)
+            keys = rows * self.columns + columns
+            self.order = np.argsort(keys, kind='stable')
+            self.keys = keys[self.order]
+            return
+        cells = self.cells
+        used = self.used
+        for index in range(len(xs)):
+            cell = self.row(ys[index]) * self.columns + self.column(xs[index])
+            if not cells[cell]:
+                used.append(cell)
+            cells[cell].append(index)
+
+    def query(self, left, top, right, bottom):
+        left = self.column(left)
+        right = self.column(right)
+        result = []
+        if self.order is not None:
+            for row in range(self.row(top), self.row(bottom) + 1):
+                start = np.searchsorted(self.keys, row * self.columns + left, 'left')
+                end = np.searchsorted(self.keys, row * self.columns + right, 'right')
+                result.extend(self.order[start:end].tolist())
+        else:
+            for row in range(self.row(top), self.row(bottom) + 1):
+                for column in range(left, right + 1):
+                    result.extend(self.cells[row * self.columns + column])
+        result.sort()
+        return result
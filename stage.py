@@ -0,0 +1,79 @@
+"""
+关卡数据
+
+关卡保存在 assets/stages/stage-<n>.json 中（第 0 关为 stage-1.json）：
+
+    music   背景音乐，{ "name": 指令, "file": assets/audios 中的文件 }
+    assets  标题界面时预先加载的资源，{ "images": [], "dirs": [], "audios": [] }
+    events  敌人出现的时间表，每一项为：
+        at      第一次出现的帧
+        every   重复的间隔，省略时只出现一次
+        until   最后一次可以出现的帧（包含），与 times 二选一
+        times   出现的次数
+        spawn   敌人原型的名字，见 archetype.py
+        args    传给敌人的参数
+        index   每次出现 index 个敌人，第 i 个敌人的第一个参数为 i，一次批量生成
+
+加载时把时间表编译为 帧 -> [(原型, [每个敌人的参数])]，每帧只查一次字典。
+同一帧出现的敌人按文件中的顺序生成。
+"""
+
+import os
+import json
+
+from archetype import archetype
+
+STAGE_DIR = os.path.join('assets', 'stages')
+
+class Stage:
+
+    def __init__(self, index, data) -> None:
+        self.index = index
+        self.name = data.get('name', 'stage-%d' % (index + 1))
+        music = data['music']
+        self.music = music['name']
+        self.musicFile = music['file']
+        self.assets = data.get('assets', {})
+        self.events = data.get('events', [])
+        self.timeline = compileTimeline(self.events)
+        # 最后一个敌人出现的帧
+        self.end = max(self.timeline) if self.timeline else 0
+
+    @staticmethod
+    def path(index):
+        return os.path.join(STAGE_DIR, 'stage-%d.json' % (index + 1))
+
+    def spawns(self, tick):
+        return self.timeline.get(tick, ())
+
+def ticks(event):
+    start = event['at']
+    every = event.get('every', 0)
+    if not every:
+        return (start,)
+    if 'times' in event:
+        return range(start, start + every * event['times'], every)
+    return range(start, event.get('until', start) + 1, every)
+
+def compileTimeline(events):
+    timeline = {}
+    for event in events:
+        enemy = archetype(event['spawn'])
+        args = tuple(event.get('args', ()))
+        if 'index' in event:
+            spawn = (enemy, [ (i,) + args for i in range(event['index']) ])
+        else:
+            spawn = (enemy, [ args ])
+        for tick in ticks(event):
+            timeline.setdefault(tick, []).append(spawn)
+    return timeline
+
+# 关卡序号 -> Stage，每个关卡只读取一次
+stages = {}
+
+def loadStage(index):
+    stage = stages.get(index)
+    if stage is None:
+        with open(Stage.path(index), encoding='utf-8') as f:
+            stage = stages[index] = Stage(index, json.load(f))
+    return stage
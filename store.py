@@ -0,0 +1,295 @@
+"""
+组件存储
+
+每种组件保存在一个紧凑的数组（dense）中，并按实体 id 建立稀疏索引（sparse）。
+删除时把数组末尾的组件移动到被删除的位置（swap-and-pop），删除代价为 O(1)。
+
+ComponentStore 仍然是 `类型 -> 组件数组` 的字典，ComponentArray 支持遍历、下标、
+len、append、remove、clear，因此原有 `Component.components.get('danmaku')` 的写法不变。
+注意：删除会改变数组中组件的顺序。
+
+query('position', 'velocity') 返回同时拥有这些组件的实体的联合视图（QueryView），每行是按参数顺序排列的组件元组。
+视图在第一次查询时建立并缓存，之后随组件的添加、实体的删除增量更新，不需要每帧重新连接。
+删除实体需要经过 ComponentStore（removeEntity），直接修改 ComponentArray 不会更新视图。
+
+with store.batch(): 期间添加的组件先暂存，结束时 addMany() 一次加入：每个实体的每个视图只连接一次，
+而不是每添加一个组件连接一次。视图中行的顺序与逐个添加时相同。
+"""
+
+from contextlib import contextmanager
+
+class ComponentArray:
+
+    def __init__(self, cls) -> None:
+        self.cls = cls
+        self.dense = []
+        self.sparse = {}
+
+    def __len__(self):
+        return len(self.dense)
+
+    def __iter__(self):
+        return iter(self.dense)
+
+    def __getitem__(self, index):
+        return self.dense[index]
+
+    def __contains__(self, component):
+        index = self.sparse.get(component.id)
+        return index is not None and self.dense[index] is component
+
+    def get(self, id):
+        index = self.sparse.get(id)
+        if index is None:
+            return None
+        return self.dense[index]
+
+    def add(self, component):
+        if component.id in self.sparse:
+            raise ValueError('entity %s already has a %s component' % (component.id, self.cls))
+        self.sparse[component.id] = len(self.dense)
+        self.dense.append(component)
+
+    append = add
+
+    def discard(self, id):
+        index = self.sparse.pop(id, None)
+        if index is None:
+            return None
+        dense = self.dense
+        component = dense[index]
+        last = dense.pop()
+        if last is not component:
+            dense[index] = last
+            self.sparse[last.id] = index
+        return component
+
+    def discardMany(self, ids):
+        # 删除的数量超过一半时整体重建，否则逐个 swap-and-pop
+        sparse = self.sparse
+        ids = [ id for id in ids if id in sparse ]
+        if len(ids) * 2 < len(self.dense):
+            for id in ids:
+                self.discard(id)
+            return
+        removed = set(ids)
+        self.dense[:] = [ component for component in self.dense if component.id not in removed ]
+        sparse.clear()
+        for index, component in enumerate(self.dense):
+            sparse[component.id] = index
+
+    def remove(self, component):
+        if component not in self:
+            raise ValueError('%s component of entity %s is not stored' % (self.cls, component.id))
+        self.discard(component.id)
+
+    def clear(self):
+        self.dense.clear()
+        self.sparse.clear()
+
+
+class QueryView:
+
+    def __init__(self, types) -> None:
+        self.types = types
+        self.rows = []
+        self.ids = []
+        self.sparse = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def get(self, id):
+        index = self.sparse.get(id)
+        if index is None:
+            return None
+        return self.rows[index]
+
+    def add(self, id, row):
+        self.sparse[id] = len(self.rows)
+        self.rows.append(row)
+        self.ids.append(id)
+
+    def discard(self, id):
+        index = self.sparse.pop(id, None)
+        if index is None:
+            return
+        rows = self.rows
+        ids = self.ids
+        last = rows.pop()
+        lastId = ids.pop()
+        if index < len(rows):
+            rows[index] = last
+            ids[index] = lastId
+            self.sparse[lastId] = index
+
+    def discardMany(self, ids):
+        sparse = self.sparse
+        ids = [ id for id in ids if id in sparse ]
+        if len(ids) * 2 < len(self.rows):
+            for id in ids:
+                self.discard(id)
+            return
+        removed = set(ids)
+        kept = [ (id, row) for id, row in zip(self.ids, self.rows) if id not in removed ]
+        self.ids[:] = [ id for id, _ in kept ]
+        self.rows[:] = [ row for _, row in kept ]
+        sparse.clear()
+        for index, id in enumerate(self.ids):
+            sparse[id] = index
+
+    def clear(self):
+        self.rows.clear()
+        self.ids.clear()
+        self.sparse.clear()
+
+
+class ComponentStore(dict):
+
+    def __init__(self) -> None:
+        super().__init__()
+        # 实体 id -> 该实体拥有的组件类型
+        self.entityTypes = {}
+        # 组件类型元组 -> QueryView
+        self.views = {}
+        # 组件类型 -> 包含该类型的 QueryView
+        self.viewsByType = {}
+        # batch() 期间暂存的组件
+        self.pending = None
+
+    def add(self, component):
+        if self.pending is not None:
+            self.pending.append(component)
+            return
+        array = self.get(component.cls)
+        if array is None:
+            array = ComponentArray(component.cls)
+            self[component.cls] = array
+        array.add(component)
+        types = self.entityTypes.get(component.id)
+        if types is None:
+            self.entityTypes[component.id] = [component.cls]
+        else:
+            types.append(component.cls)
+        for view in self.viewsByType.get(component.cls, ()):
+            row = self.join(view.types, component.id)
+            if row is not None:
+                view.add(component.id, row)
+
+    @contextmanager
+    def batch(self):
+        # 可以嵌套，最外层结束时加入
+        if self.pending is not None:
+            yield
+            return
+        self.pending = []
+        try:
+            yield
+        finally:
+            pending = self.pending
+            self.pending = None
+            self.addMany(pending)
+
+    def addMany(self, components):
+        # 先加入全部组件，再按实体的顺序更新视图
+        views = {}
+        for component in components:
+            cls = component.cls
+            array = self.get(cls)
+            if array is None:
+                array = ComponentArray(cls)
+                self[cls] = array
+            array.add(component)
+            id = component.id
+            types = self.entityTypes.get(id)
+            if types is None:
+                self.entityTypes[id] = [cls]
+            else:
+                types.append(cls)
+            entityViews = views.get(id)
+            if entityViews is None:
+                entityViews = views[id] = {}
+            for view in self.viewsByType.get(cls, ()):
+                entityViews[view] = None
+        for id, entityViews in views.items():
+            for view in entityViews:
+                if id in view.sparse:
+                    continue
+                row = self.join(view.types, id)
+                if row is not None:
+                    view.add(id, row)
+
+    def join(self, types, id):
+        # 实体拥有全部 types 组件时返回组件元组，否则返回 None
+        row = []
+        for cls in types:
+            array = self.get(cls)
+            if array is None:
+                return None
+            component = array.get(id)
+            if component is None:
+                return None
+            row.append(component)
+        return tuple(row)
+
+    def query(self, *types):
+        view = self.views.get(types)
+        if view is not None:
+            return view
+        view = QueryView(types)
+        self.views[types] = view
+        for cls in dict.fromkeys(types):
+            self.viewsByType.setdefault(cls, []).append(view)
+        self.build(view)
+        return view
+
+    def build(self, view):
+        # 从最少的组件开始连接
+        arrays = [ self.get(cls) for cls in view.types ]
+        if not arrays or None in arrays:
+            return
+        smallest = min(arrays, key=len)
+        for component in smallest:
+            row = self.join(view.types, component.id)
+            if row is not None:
+                view.add(component.id, row)
+
+    def removeEntity(self, id):
+        types = self.entityTypes.pop(id, None)
+        if types is None:
+            return
+        for cls in types:
+            self[cls].discard(id)
+            for view in self.viewsByType.get(cls, ()):
+                view.discard(id)
+
+    def removeEntities(self, ids):
+        # 批量删除：按组件类型分组后一次删除
+        grouped = {}
+        for id in ids:
+            types = self.entityTypes.pop(id, None)
+            if types is None:
+                continue
+            for cls in types:
+                grouped.setdefault(cls, []).append(id)
+        # 视图中的实体拥有视图的每一种组件，用任意一种组件的删除列表即可
+        views = {}
+        for cls, removed in grouped.items():
+            self[cls].discardMany(removed)
+            for view in self.viewsByType.get(cls, ()):
+                views.setdefault(view, removed)
+        for view, removed in views.items():
+            view.discardMany(removed)
+
+    def clear(self):
+        super().clear()
+        self.entityTypes.clear()
+        # 保留已建立的视图，持有视图的系统在新关卡中继续使用
+        for view in self.views.values():
+            view.clear()
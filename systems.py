@@ -1,5 +1,6 @@
 import abc
 import math
+import threading
 
 from PyQt5.QtCore import QRectF, Qt
 from PyQt5.QtGui import QPainter
@@ -9,6 +10,10 @@ from gui import gui
 from util import *
 from entities import *
 from components import *
+from collision import CollisionLayer, DanmakuLayer, CollisionPair
+from snapshot import snapshots, interpolate, lerp
+from stage import loadStage
+from replay import INPUT_BITS, transitions
 
 GROUND_X = 50
 GROUND_Y = 20
@@ -208,21 +213,45 @@ class Bomb(KeyListener):
                 self.star.value -= 1
                 danmakus = Component.components.get('danmaku')
                 if danmakus is not None:
-                    danmakus.clear()
+                    for danmakuCom in danmakus:
+                        danmakuCom.danmaku.destory()
                 enemyComs = Component.components.get('enemy')
                 removes = []
                 if enemyComs is None:
                     return
                 for enemyCom in enemyComs:
                     enemy = enemyCom.enemy
+                    if not enemy.alive:
+                        continue
                     enemy.healthCom.health -= 30
                     if enemy.healthCom.dead():
                         self.score.value += 300
                         removes.append(enemy)
-                enemy_remove = set(removes)
-                for enemy in enemy_remove:
+                for enemy in dict.fromkeys(removes):
                     enemy.destroy()
 
+class RenderToggle(KeyListener):
+
+    @property
+    def listens(self):
+        return [ Qt.Key_V ]
+
+    def dispatch(self, key, flag):
+        # 切换弹幕的批量绘制
+        if flag == True:
+            GameDanmaku.batched = not GameDanmaku.batched
+
+class ProfilerToggle(KeyListener):
+
+    @property
+    def listens(self):
+        return [ Qt.Key_P ]
+
+    def dispatch(self, key, flag):
+        # 显示 / 隐藏性能统计
+        if flag == True:
+            profiler.toggleOverlay()
+
 class PlayerSys(System):
 
     def __init__(self, world) -> None:
@@ -236,16 +265,58 @@ class PlayerSys(System):
         self.listeners.append(PlayerFire(self.player))
         self.listeners.append(GameEnd(self.player, world))
         self.listeners.append(Bomb(self.player, world))
+        self.listeners.append(RenderToggle())
+        self.listeners.append(ProfilerToggle())
+        # 操作自机的按键（INPUT_BITS）不在 GUI 线程中立即处理，而是在每帧开始时锁存：
+        # held 为当前按住的键，tapped 为上一帧以来按下过的键（一帧之内按下又松开也至少生效一帧），
+        # state 为已经生效的状态，录像与回放都只使用每帧的状态
+        self.held = 0
+        self.tapped = 0
+        self.state = 0
+        self.lock = threading.Lock()
 
     def cancel(self):
         gui.unSubscribe(self)
 
     def keyPressEvent(self, event):
-        if not event.isAutoRepeat():
-            self.dispatch(event.key(), True)
+        if event.isAutoRepeat():
+            return
+        key = event.key()
+        bit = INPUT_BITS.get(key)
+        if bit is None:
+            self.dispatch(key, True)
+            return
+        with self.lock:
+            self.held |= bit
+            self.tapped |= bit
 
     def keyReleaseEvent(self, event):
-        self.dispatch(event.key(), False)
+        # 按住时系统重复发送的松开事件不是真正的松开
+        if event.isAutoRepeat():
+            return
+        key = event.key()
+        bit = INPUT_BITS.get(key)
+        if bit is None:
+            self.dispatch(key, False)
+            return
+        with self.lock:
+            self.held &= ~bit
+
+    def latch(self):
+        # 本帧的按键状态：回放时来自录像，否则来自键盘
+        replay = self.world.replay
+        if replay is not None:
+            mask = replay.mask(self.world.tick)
+        else:
+            with self.lock:
+                mask = self.held | self.tapped
+                self.tapped = 0
+        recorder = self.world.recorder
+        if recorder is not None:
+            recorder.record(self.world.tick, mask)
+        for key, flag in transitions(self.state, mask):
+            self.dispatch(key, flag)
+        self.state = mask
 
     def dispatch(self, key, flag):
         for listener in self.listeners:
@@ -253,18 +324,24 @@ class PlayerSys(System):
                 listener.dispatch(key, flag)
 
     def nextTick(self):
+        self.latch()
+
         # revive
         if self.player.invincible > 0:
             self.player.invincible -= 1
 
+        # bomb animation
+        if self.player.bombY >= -550:
+            self.player.bombY -= 20
+
         # fire logic
         fireCom = self.player.fireCom
         if fireCom.counter > 0:
             fireCom.counter -= 1
         elif fireCom.firing:
-            # create dan
+            # create dan，帧末生成
             speed = fireCom.speed
-            Dan(self.player, speed)
+            commands.spawn(Dan.spawn, self.player, speed)
 
 
 class BoardSys(System):
@@ -353,22 +430,21 @@ class AccelerationSys(System):
 
     def __init__(self, world) -> None:
         super().__init__(world)
+        self.accelerators = world.query('acceleration', 'velocity')
 
     def cancel(self):
         pass
 
     def nextTick(self):
-        accelerators = Component.components.get('acceleration')
-        if accelerators is None:
+        if kinematics.enabled:
+            kinematics.accelerate()
             return
-        for accelerator in accelerators:
-            entity = Entity.entities.get(accelerator.id)
-            velocity = entity.velocityCom
+        for accelerator, velocity in self.accelerators:
             # 编写使用加速度改变速度的逻辑
-            velocityX = round(math.sin(math.radians(velocity.direction)), 2) * velocity.speed
-            velocityY = round(math.cos(math.radians(velocity.direction)), 2) * velocity.speed
-            accelerationX = round(math.sin(math.radians(accelerator.direction)), 2) * accelerator.acceleration
-            accelerationY = round(math.cos(math.radians(accelerator.direction)), 2) * accelerator.acceleration
+            velocityX = velocity.vx
+            velocityY = velocity.vy
+            accelerationX = accelerator.ux * accelerator.acceleration
+            accelerationY = accelerator.uy * accelerator.acceleration
             x = velocityX + accelerationX
             y = velocityY + accelerationY
             speed = round((x ** 2 + y ** 2) ** 0.5, 2)
@@ -385,17 +461,18 @@ class MoveSys(System):
 
     def __init__(self, world) -> None:
         super().__init__(world)
+        self.movers = world.query('move', 'position', 'velocity', 'size')
+        self.danmakus = world.query('danmaku', 'move', 'velocity')
 
     def cancel(self):
         pass
 
     def move(self, position, velocity, size):
-        if velocity.speed == 0:
+        speed = velocity.speed
+        if speed == 0:
             return
-        offsetX = round(math.sin(math.radians(velocity.direction)), 2) * velocity.speed
-        offsetY = round(math.cos(math.radians(velocity.direction)), 2) * velocity.speed
-        position.x += offsetX
-        position.y += offsetY
+        position.x += velocity.ux * speed
+        position.y += velocity.uy * speed
         if not position.enableOut:
             if position.x < 0:
                 position.x = 0
@@ -408,20 +485,88 @@ class MoveSys(System):
             
 
     def nextTick(self):
-        movers = Component.components.get('move')
-        if movers is None:
+        if kinematics.enabled:
+            kinematics.move(GROUND_WIDTH, GROUND_HEIGHT)
             return
-        for mover in movers:
-            if not mover.moving:
-                continue
-            entity = Entity.entities.get(mover.id)
-            position = entity.positionCom
-            velocity = entity.velocityCom
-            size = entity.sizeCom
-            self.move(position, velocity, size)
-            if hasattr(entity, 'danmakuCom') and entity.speed * 0.8 < velocity.speed:
+        for mover, position, velocity, size in self.movers:
+            if mover.moving:
+                self.move(position, velocity, size)
+        # 弹幕速度衰减到初速度的 80%
+        for danmakuCom, mover, velocity in self.danmakus:
+            if mover.moving and danmakuCom.danmaku.speed * 0.8 < velocity.speed:
                 velocity.speed *= 0.99
 
+class CollisionSys(System):
+    """
+    碰撞检测：声明碰撞层与需要检测的层对，每帧一次重建网格并把各层对的接触交给处理函数
+    """
+
+    def __init__(self, world) -> None:
+        super().__init__(world)
+        # 子弹与敌人使用场地坐标，弹幕与自机使用场景坐标，网格覆盖各自坐标系中的场地
+        fieldBounds = (0, 0, GROUND_WIDTH, GROUND_HEIGHT)
+        sceneBounds = (GROUND_X, GROUND_Y, GROUND_WIDTH, GROUND_HEIGHT)
+        self.layers = {
+            'dan': CollisionLayer('dan', self.danBox, fieldBounds),
+            'enemy': CollisionLayer('enemy', self.sizeBox, fieldBounds),
+            'danmaku': DanmakuLayer(self.danmakuBox, sceneBounds),
+            'player': CollisionLayer('player', self.playerBox, sceneBounds),
+        }
+        self.pairs = {
+            'shot-enemy': CollisionPair(self.layers['dan'], self.layers['enemy'], self.shotHitsEnemy),
+            # 弹幕与自机只做粗检测，范围包括 40 像素的擦弹范围
+            'danmaku-player': CollisionPair(self.layers['danmaku'], self.layers['player'], margin=40),
+        }
+
+    @staticmethod
+    def sizeBox(entity):
+        position = entity.positionCom
+        size = entity.sizeCom
+        return position.x + size.width / 2, position.y + size.height / 2, size.width / 2, size.height / 2
+
+    @staticmethod
+    def danBox(dan):
+        position = dan.positionCom
+        size = dan.sizeCom
+        return position.x + 14 + size.width / 2, position.y + size.height / 2, size.width / 2, size.height / 2
+
+    @staticmethod
+    def danmakuBox(danmaku):
+        position = danmaku.positionCom.position
+        size = danmaku.sizeCom
+        return position.x() + size.width / 2, position.y() + size.height / 2, size.width / 2, size.height / 2
+
+    @staticmethod
+    def playerBox(player):
+        rect = player.collisionCom.rect
+        return rect.center().x(), rect.center().y(), rect.width() / 2, rect.height() / 2
+
+    @staticmethod
+    def shotHitsEnemy(enemy, dan):
+        danLeft = dan.positionCom.x + 14
+        danTop = dan.positionCom.y
+        danRight = danLeft + dan.sizeCom.width
+        danBottom = danTop + dan.sizeCom.height
+        enemyLeft = enemy.positionCom.x
+        enemyTop = enemy.positionCom.y
+        enemyRight = enemyLeft + enemy.sizeCom.width
+        enemyBottom = enemyTop + enemy.sizeCom.height
+        xCo = (danRight > enemyLeft and danRight < enemyRight) or (danLeft > enemyLeft and danLeft < enemyRight)
+        yCo = (danTop > enemyTop and danTop < enemyBottom) or (danBottom > enemyTop and danBottom < enemyBottom)
+        return xCo and yCo
+
+    def nextTick(self):
+        pairs = [ pair for pair in self.pairs.values() if pair.active ]
+        for layer in dict.fromkeys(pair.indexed for pair in pairs):
+            layer.index()
+        for pair in self.pairs.values():
+            contacts = pair.contacts() if pair.active else []
+            if pair.handler is not None:
+                pair.handler(contacts)
+
+    def cancel(self):
+        pass
+
 class PlayerCollisionSys(System):
 
     def __init__(self, world) -> None:
@@ -429,24 +574,29 @@ class PlayerCollisionSys(System):
         self.player = Entity.entities.get(Component.components.get('player')[0].id)
         self.cadan = Component.components.get('cadan')[0]
         self.score = Component.components.get('score')[0]
+        self.pair = world.collision.pairs['danmaku-player']
+        self.pair.handler = self.onContact
 
     def nextTick(self):
-        danmakuComs = Component.components.get('danmaku')
-        if danmakuComs is None:
-            return
+        # 无敌时不检测
         if self.player.invincible > 0:
             self.player.invincible -= 1
-            return
-        for danmakuCom in danmakuComs:
-            danmaku = Entity.entities.get(danmakuCom.id)
-            player = Entity.entities.get(Component.components.get('player')[0].id)
-            playerPos = player.positionCom.position
+            self.pair.active = False
+        else:
+            self.pair.active = True
+
+    def onContact(self, contacts):
+        playerR = 5
+        i = 0
+        while i < len(contacts):
+            _, danmaku, order = contacts[i]
+            i += 1
+            playerPos = self.player.positionCom.position
             danmakuX = danmaku.positionCom.position.x() + danmaku.sizeCom.width / 2
             danmakuY = danmaku.positionCom.position.y() + danmaku.sizeCom.height / 2
             danmakuR = danmaku.sizeCom.width / 2
             playerX = playerPos.x() + 22
             playerY = playerPos.y() + 19
-            playerR = 5
             distance = ((danmakuX - playerX) ** 2 + (danmakuY - playerY) ** 2) ** 0.5
             isCollided = distance < (danmakuR + playerR)
             if isCollided:
@@ -459,6 +609,9 @@ class PlayerCollisionSys(System):
                 if heart.val < 0:
                     print('你没命了')
                     self.world.running = False
+                # 玩家回到出生点，在新位置附近继续检测剩下的弹幕
+                contacts = [ contact for contact in self.pair.detect(self.player) if contact[2] > order ]
+                i = 0
             elif not danmaku.isCaed and distance < (danmakuR + playerR) + 40:
                 self.cadan.value += 1
                 danmaku.isCaed = True
@@ -471,26 +624,24 @@ class DanManageSys(System):
 
     def __init__(self, world) -> None:
         super().__init__(world)
-        self.painter = PaintGraphicsItem(self)
-        self.rect = QRectF(50, 20, 550, 675)
+        self.dans = world.query('dan', 'position', 'velocity', 'size')
 
     def nextTick(self):
-        pass
+        removeDan = []
+        for danCom, position, velocity, size in self.dans:
+            self.moveDan(position, velocity)
+            if self.isDanOutside(position, size):
+                removeDan.append(danCom.dan)
+        for dan in removeDan:
+            dan.destory()
 
     def cancel(self):
-        gui.removeGraphicsItem(self.painter)
-
-    def boundingRect(self):
-        return self.rect
+        pass
 
-    def moveDan(self, dan):
-        pos = dan.positionCom
-        velocity = dan.velocityCom
-        pos.y -= velocity.speed
+    def moveDan(self, position, velocity):
+        position.y -= velocity.speed
 
-    def isDanOutside(self, dan):
-        position = dan.positionCom
-        size = dan.sizeCom
+    def isDanOutside(self, position, size):
         isOut = False
         if position.x > GROUND_WIDTH:
             isOut = True
@@ -502,28 +653,17 @@ class DanManageSys(System):
             isOut = True
         return isOut
 
-    def paint(self, painter: QPainter):
-        if Component.components.get('dan') == None:
-            return
-        removeDan = []
-        danComs = Component.components.get('dan')
-        for danCom in danComs:
-            dan = Entity.entities.get(danCom.id)
-            self.moveDan(dan)
-            if self.isDanOutside(dan):
-                removeDan.append(dan)
-        for dan in removeDan:
-            dan.destory()
-
 class EnemyManageSys(System):
 
     def __init__(self, world, stage) -> None:
         super().__init__(world)
-        gui.subscribe(self)
-
         self.time = 0
         self.stage = stage
+        # 关卡的时间表，见 stage.py
+        self.stageData = loadStage(stage)
         self.score = Component.components.get('score')[0]
+        world.collision.pairs['shot-enemy'].handler = self.onShot
+        self.enemies = world.query('enemy', 'position', 'size')
 
     def isOut(self, position, size):
         isOut = False
@@ -539,99 +679,37 @@ class EnemyManageSys(System):
 
     def nextTick(self):
         self.time += 1
-        if (self.time >= 180 and self.time <= 300 and self.time % 20 == 0):
-            Enemy1()
-            Enemy2()
-        elif self.time == 360:
-            Enemy3()
-        elif (self.time >= 400 and self.time < 700 and self.time % 20 == 0):
-            Enemy4()
-        elif (self.time >= 800 and self.time < 1100 and self.time % 20 == 0):
-            Enemy5()
-            if self.time == 840:
-                Enemy6()
-        elif (self.time >= 1200 and self.time < 1500 and self.time % 20 == 0):
-            Enemy4(20)
-        elif (self.time >= 1600 and self.time < 1900 and self.time % 20 == 0):
-            Enemy5()
-            if self.time % 30 == 0:
-                Enemy6()
-        elif self.time >= 2000 and self.time < 2810 and self.time % 30 == 0:
-            Enemy7()
-            Enemy8()
-        elif self.time == 2870:
-            Enemy9()
-        elif self.time == 3050:
-            Enemy10(100)
-        elif self.time == 3220:
-            Enemy10(-100)
-        elif self.time == 3400:
-            Enemy10(100)
-            Enemy10(-100)
-        elif self.time == 3700:
-            for i in range(10):
-                Enemy12(i)
-        elif self.time == 3900:
-            for i in range(10):
-                Enemy13(i)
-        elif self.time == 4100:
-            for i in range(10):
-                Enemy12(i)
-        elif self.time == 4300:
-            for i in range(10):
-                Enemy13(i)
-        elif self.time == 4500:
-            Enemy15()
-        else:
-            pass
-        ################################################
-        enemyComs = Component.components.get('enemy')
-        danComs = Component.components.get('dan')
-        dans = None
-        if danComs is not None:
-            dans = [ Entity.entities.get(danCom.id) for danCom in danComs ]
-        if enemyComs is None:
-            return
+        # 本帧出现的敌人帧末一次批量生成
+        for archetype, argsList in self.stageData.spawns(self.time):
+            commands.spawn(archetype.spawnMany, argsList)
         removes = []
-        for enemyCom in enemyComs:
-            enemy = enemyCom.enemy
-            position = enemy.positionCom
-            size = enemy.sizeCom
+        for enemyCom, position, size in self.enemies:
             if self.isOut(position, size):
+                removes.append(enemyCom.enemy)
+        for enemy in removes:
+            enemy.destroy()
+
+    def onShot(self, contacts):
+        # 自机子弹命中敌人，contacts 按敌人、子弹的顺序排列
+        removes = []
+        for enemy, dan, _ in contacts:
+            self.score.value += 10
+            dan.destory()
+            enemy.healthCom.decrease()
+            if enemy.healthCom.dead():
+                self.score.value += 300
                 removes.append(enemy)
-                continue
-            # 检测Dan碰撞
-            if dans is None:
-                continue
-            for dan in dans:
-                danSize = dan.sizeCom
-                # 左上角坐标
-                danPosition = dan.positionCom
-                enemySize = enemy.sizeCom
-                enemyPosition = enemy.positionCom
-                danRect = QRectF(danPosition.x + 14, danPosition.y, danSize.width, danSize.height)
-                enemyRect = QRectF(enemyPosition.x, enemyPosition.y, enemySize.width, enemySize.height)
-                xCo = (danRect.right() > enemyRect.left() and danRect.right() < enemyRect.right()) or (danRect.left() > enemyRect.left() and danRect.left() < enemyRect.right())
-                yCo = (danRect.top() > enemyRect.top() and danRect.top() < enemyRect.bottom()) or (danRect.bottom() > enemyRect.top() and danRect.bottom() < enemyRect.bottom())
-                co = xCo and yCo
-                if co:
-                    # scorexxx
-                    self.score.value += 10
-                    dan.destory()
-                    enemy.healthCom.decrease()
-                    if enemy.healthCom.dead():
-                        self.score.value += 300
-                        removes.append(enemy)
-        enemy_remove = set(removes)
-        for enemy in enemy_remove:
+        # 保持删除顺序，避免 set 的顺序随对象地址变化
+        for enemy in dict.fromkeys(removes):
             enemy.destroy()
 
-    def cancel(self):
-        gui.unSubscribe(self)
+    def capture(self, snapshot):
+        # 关卡时间显示在性能统计中
+        if profiler.overlay:
+            snapshot.stats.append('stage time %d' % self.time)
 
-    def keyPressEvent(self, event):
-        if event.key() == Qt.Key_T:
-            print(self.time)
+    def cancel(self):
+        pass
 
 class EnemyRenderSys(System):
 
@@ -639,7 +717,8 @@ class EnemyRenderSys(System):
         super().__init__(world)
         self.painter = PaintGraphicsItem(self)
         self.rect = QRectF(50, 20, 550, 675)
-        self.enemyImg = QImage('assets/bm.png')
+        self.enemyImg = assets.image('assets/bm.png')
+        self.enemies = world.query('enemy', 'position', 'size')
 
     def nextTick(self):
         pass
@@ -650,45 +729,46 @@ class EnemyRenderSys(System):
     def boundingRect(self):
         return self.rect
 
+    @staticmethod
+    def columns(enemies):
+        # (ids, xs, ys)
+        return [ enemy[0] for enemy in enemies ], [ enemy[1] for enemy in enemies ], [ enemy[2] for enemy in enemies ]
+
+    def capture(self, snapshot):
+        enemies = []
+        for enemyCom, position, size in self.enemies:
+            pos = position.position
+            enemies.append((position.id, pos.x(), pos.y(), size.width, size.height, getattr(enemyCom.enemy, 'image', None)))
+        snapshot.enemies = enemies
+
     def paint(self, painter: QPainter):
-        if Component.components.get('enemy') == None:
+        previous, snapshot, alpha = snapshots.frame()
+        if snapshot is None:
             return
-        enemyComs = Component.components.get('enemy')
-        for enemyCom in enemyComs:
-            enemy = Entity.entities.get(enemyCom.id)
-            pos = enemy.positionCom.position
-            size = enemy.sizeCom
-            x = pos.x() - size.width / 2
-            y = pos.y() - size.height / 2
-            image = self.enemyImg
-            if hasattr(enemy, 'image'):
-                image = enemy.image
-            painter.drawImage(QRectF(x, y, size.width, size.height), image)
+        enemies = snapshot.enemies
+        xs, ys = interpolate(previous and self.columns(previous.enemies), self.columns(enemies), alpha)
+        for (_, _, _, width, height, image), x, y in zip(enemies, xs, ys):
+            if image is None:
+                image = self.enemyImg
+            painter.drawImage(QRectF(x - width / 2, y - height / 2, width, height), image)
 
 class EnemyShootSys(System):
 
     def __init__(self, world) -> None:
         super().__init__(world)
         self.player = Entity.entities.get(Component.components.get('player')[0].id)
+        self.shooters = world.query('enemy', 'position', 'shooter')
 
     def nextTick(self):
-        enemyComs = Component.components.get('enemy')
-        if enemyComs is None:
-            return
-        for enemyCom in enemyComs:
-            enemy = enemyCom.enemy
-            shooter = enemy.shooterCom
+        for enemyCom, pos, shooter in self.shooters:
+            # 本帧被击破的敌人不再射击
+            if not enemyCom.enemy.alive:
+                continue
             if shooter.cooldown > 0:
                 shooter.cooldown -= 1
                 continue
-            pos = enemy.positionCom
             shooter.cooldown = shooter.interval
-            directions = shooter.direction(self.player)
-            size = 15
-            if hasattr(shooter, 'size'):
-                size = shooter.size
-            for direction in directions:
-                Danmaku(pos.x, pos.y, shooter.speed, direction, size)
+            commands.spawn(Danmaku.spawnVolley, pos.x, pos.y, shooter.speed, shooter.volley(self.player, self.world.random), shooter.size)
 
     def cancel(self):
         pass
@@ -699,6 +779,14 @@ class DanmakuManageSys(System):
         super().__init__(world)
 
     def nextTick(self):
+        if kinematics.enabled:
+            outside = kinematics.outsideDanmaku(GROUND_WIDTH, GROUND_HEIGHT)
+            if outside:
+                # 按组件顺序销毁，与逐实体计算时相同，之后组件的顺序（以及碰撞处理的顺序）也相同
+                outside.sort(key=Component.components.get('danmaku').sparse.__getitem__)
+            for id in outside:
+                Entity.entities[id].destory()
+            return
         danmakuComs = Component.components.get('danmaku')
         if danmakuComs is None:
             return
@@ -745,10 +833,12 @@ class PlayerRenderSys(System):
 
         self.position = QtCore.QPointF(0, 0)
         self.lowSpeed = False
-        self.danImage = QImage('assets/dan.png')
-        self.imageBomb = QImage('assets/Bomb_f01.png')
+        self.danImage = assets.image('assets/dan.png')
+        self.imageBomb = assets.image('assets/Bomb_f01.png')
+        self.dans = world.query('dan', 'position')
 
     def nextTick(self):
+        self.directive = self.player.velocityCom.horizontalDirection
         if self._ticker + 1 >= self._maxTick:
             if self.directive == 'default':
                 self._ticker = 0
@@ -778,39 +868,50 @@ class PlayerRenderSys(System):
     def index(self) -> None:
         return math.floor(self._ticker / self._interval)
 
+    def capture(self, snapshot):
+        player = self.player
+        position = player.positionCom.position
+        snapshot.player = (position.x(), position.y(), self.image, player.invincible, player.reviveTime, player.bombY, player.lowSpeed)
+        ids = []
+        xs = []
+        ys = []
+        for _, position in self.dans:
+            ids.append(position.id)
+            xs.append(position.x + GROUND_X)
+            ys.append(position.y + GROUND_Y)
+        snapshot.dans = (ids, xs, ys)
+
     def paint(self, painter: QtGui.QPainter):
+        previous, snapshot, alpha = snapshots.frame()
+        if snapshot is None or snapshot.player is None:
+            return
+        x, y, image, invincible, reviveTime, bombY, lowSpeed = snapshot.player
+        if previous is not None and previous.player is not None and alpha < 1:
+            x = lerp(previous.player[0], x, alpha)
+            y = lerp(previous.player[1], y, alpha)
+            bombY = lerp(previous.player[5], bombY, alpha)
+        self.position = QtCore.QPointF(x, y)
         rect = self.boundingRect()
-        self.position = self.player.positionCom.position
-        self.directive = self.player.velocityCom.horizontalDirection
-        
-        if self.player.invincible > 0 and self.player.invincible % 3 == 0:
+
+        if invincible > 0 and invincible % 3 == 0:
             return
 
-        if self.player.bombY >= -550:
-            self.player.bombY -= 20
-            painter.drawImage(QRectF(50, self.player.bombY, 550, 550), self.imageBomb)
+        if bombY >= -550:
+            painter.drawImage(QRectF(50, bombY, 550, 550), self.imageBomb)
 
-        if self.player.invincible > self.player.reviveTime:
+        if invincible > reviveTime:
             # 来个从下到上的位移
-            gap = self.player.invincible - self.player.reviveTime
-            painter.drawImage(rect.left(), rect.top() + gap, self.image)
+            gap = invincible - reviveTime
+            painter.drawImage(QtCore.QPointF(rect.left(), rect.top() + gap), image)
         else:
-            painter.drawImage(rect, self.image)
-        if self.player.lowSpeed:
+            painter.drawImage(rect, image)
+        if lowSpeed:
             painter.setPen(self.pen)
             painter.setBrush(self.brush)
-            x = self.boundingRect().left() + 11
-            y = self.boundingRect().top() + 19
-            width = 10
-            height = 10
-            painter.drawEllipse(x, y, width, height)
-        danComs = Component.components.get('dan')
-        if danComs is not None:
-            for index in range(len(danComs) - 1, -1, -1):
-                danCom = danComs[index]
-                dan = danCom.dan
-                position = dan.positionCom.position
-                painter.drawImage(position, self.danImage)
+            painter.drawEllipse(QRectF(rect.left() + 11, rect.top() + 19, 10, 10))
+        xs, ys = interpolate(previous and previous.dans, snapshot.dans, alpha, snapshot.destroyed)
+        for index in range(len(xs) - 1, -1, -1):
+            painter.drawImage(QtCore.QPointF(xs[index], ys[index]), self.danImage)
 
     def boundingRect(self):
         return QtCore.QRectF(self.position.x(), self.position.y(), self._width, self._height)
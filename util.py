@@ -3,10 +3,16 @@ import time
 import typing
 import threading
 
-from PyQt5 import QtGui, QtCore, QtMultimedia
+from PyQt5 import QtGui, QtCore
 from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
 
 from gui import gui
+from profiler import profiler, clock
+from assets import assets
+
+# 无界面模式不加载多媒体模块，也不播放声音
+if not gui.headless:
+    from PyQt5 import QtMultimedia
 
 class AudioPlayer:
 
@@ -15,6 +21,9 @@ class AudioPlayer:
 
     @staticmethod
     def load(directive, *path):
+        if gui.headless:
+            AudioPlayer.medias[directive] = None
+            return
         file = QtCore.QUrl.fromLocalFile(QtCore.QDir.current().absoluteFilePath(os.path.join('assets', 'audios', *path))) # 音频文件路径
         content = QtMultimedia.QMediaContent(file)
         AudioPlayer.medias[directive] = content
@@ -31,29 +40,40 @@ class AudioPlayer:
         return AudioPlayer.players[directive]
 
     def __init__(self, directive) -> None:
+        self.player = None
+        if gui.headless:
+            return
         self.player = QtMultimedia.QMediaPlayer(gui)
         self.player.setMedia(AudioPlayer.medias[directive])
         self.player.setVolume(100.0)
 
     def play(self):
-        self.player.play()
+        if self.player is not None:
+            self.player.play()
 
     def stop(self):
-        self.player.stop()
+        if self.player is not None:
+            self.player.stop()
 
 class ImageGraphicsItem(QGraphicsItem):
 
     def __init__(self, imager) -> None:
         super().__init__()
         self.imager = imager
+        # 最近一次绘制的图片，图片没有换时不需要重绘
+        self.painted = None
         gui.addGraphicsItem(self)
 
     def boundingRect(self) -> QtCore.QRectF:
         if hasattr(self.imager, 'boundingRect'):
             return self.imager.boundingRect()
 
+    def changed(self):
+        return self.imager.image is not self.painted
+
     def paint(self, painter: QtGui.QPainter, option: QStyleOptionGraphicsItem, widget: typing.Optional[QWidget]) -> None:
-        painter.drawImage(self.boundingRect(), self.imager.image)
+        self.painted = self.imager.image
+        painter.drawImage(self.boundingRect(), self.painted)
 
 class PaintGraphicsItem(QGraphicsItem):
 
@@ -65,30 +85,20 @@ class PaintGraphicsItem(QGraphicsItem):
     def boundingRect(self) -> QtCore.QRectF:
         return self.painter.boundingRect()
 
+    def changed(self):
+        # 绘制者可以用 dirty 表示是否变化，没有时每帧重绘
+        return getattr(self.painter, 'dirty', True)
+
     def paint(self, painter: QtGui.QPainter, option: QStyleOptionGraphicsItem, widget: typing.Optional[QWidget]) -> None:
+        if not profiler.enabled:
+            self.painter.paint(painter)
+            return
+        start = clock()
         self.painter.paint(painter)
+        profiler.record('paint:' + type(self.painter).__name__, clock() - start)
 
 def loadImages(path):
-    images = []
-    dir, _, files = list(os.walk(path))[0]
-    files.sort()
-    for f in files:
-        if f.endswith('.png'):
-            images.append(QtGui.QImage(os.path.join(dir, f)))
-    return images
+    return assets.images(path)
 
 def loadSprites(image, directives, n_columns):
-    if not isinstance(image, QtGui.QImage):
-        image = QtGui.QImage(image)
-    n_rows = len(directives)
-    imageDict = {}
-    crop_width = image.width() / n_columns
-    crop_height = image.height() / n_rows
-    for i in range(n_rows):
-        directive = directives[i]
-        images = []
-        for j in range(n_columns):
-            img = image.copy(j * crop_width, i * crop_height, crop_width, crop_height)
-            images.append(img)
-        imageDict[directive] = images
-    return imageDict
+    return assets.sprites(image, directives, n_columns)
@@ -1,20 +1,38 @@
+import os
 import time
+import random
 import timeit
 import threading
 from typing import List
 
 from gui import gui
 from util import AudioPlayer
+from assets import assets
+from replay import InputLog
+from determinism import StateHasher
+from stage import loadStage
+from profiler import profiler, clock
+from snapshot import RenderSnapshot, snapshots
 from systems import *
 from entities import *
 
 # constants
 HZ = 60
 INTERVAL = 1 / HZ
+# 每渲染一帧最多追赶的模拟帧数
+MAX_CATCH_UP = 5
+# 渲染频率，高于 HZ 时在两帧模拟之间插值渲染
+RENDER_HZ = 120
 
 # typings
 SystemList = List[System]
 
+def loadMusic(stage):
+    # 关卡的背景音乐，返回音乐的指令
+    if stage.music not in AudioPlayer.medias:
+        AudioPlayer.load(stage.music, stage.musicFile)
+    return stage.music
+
 class SystemManager:
 
     def __init__(self, world) -> None:
@@ -25,10 +43,26 @@ class SystemManager:
         AudioPlayer.unload('zhongdan')
         for system in self.systems:
             system.cancel()
+        # 组件存储会被清空，之前的系统不能继续运行
+        self.systems.clear()
 
     def nextTick(self):
+        if not profiler.enabled:
+            for system in self.systems:
+                system.nextTick()
+            # 帧末统一执行延迟的销毁与生成
+            commands.flush()
+            return
+        tickStart = start = clock()
         for system in self.systems:
             system.nextTick()
+            end = clock()
+            profiler.record(type(system).__name__, end - start)
+            start = end
+        commands.flush()
+        end = clock()
+        profiler.record('flush', end - start)
+        profiler.record('tick', end - tickStart)
 
     def registerStarterSystems(self):
         self.systems.append(AnimationSys(world))
@@ -38,22 +72,26 @@ class SystemManager:
     def registerStageSystems(self, stage):
         AudioPlayer.load('zhongdan', 'select.wav')
         AudioPlayer.get('zhongdan')
-        if stage == 0:
-            music = 'stage-1'
+        music = loadMusic(loadStage(stage))
         self.systems.append(MusicSys(world, music))
         self.systems.append(BoardSys(world))
         self.systems.append(PlayerSys(world))
         self.systems.append(AccelerationSys(world))
         self.systems.append(MoveSys(world))
 
-        self.systems.append(PlayerRenderSys(world))
-        self.systems.append(EnemyRenderSys(world))
+        # 无界面模式不注册渲染系统
+        if not gui.headless:
+            self.systems.append(PlayerRenderSys(world))
+            self.systems.append(EnemyRenderSys(world))
         self.systems.append(DanManageSys(world))
         self.systems.append(DanmakuManageSys(world))
+        # 碰撞处理函数由 EnemyManageSys 与 PlayerCollisionSys 注册
+        world.collision = CollisionSys(world)
         self.systems.append(EnemyManageSys(world, stage))
+        self.systems.append(PlayerCollisionSys(world))
+        self.systems.append(world.collision)
 
         self.systems.append(EnemyShootSys(world))
-        self.systems.append(PlayerCollisionSys(world))
 
 class EntityManager:
 
@@ -63,12 +101,18 @@ class EntityManager:
 
     def cancelEntities(self):
         for entity in Entity.entities.values():
-            components = vars(entity).values()
-            for component in components:
-                if hasattr(component, '_graphicsItem'):
-                    gui.removeGraphicsItem(component._graphicsItem)
+            # 实体自身绘制的（弹幕、性能统计）或组件绘制的
+            for owner in (entity, *vars(entity).values()):
+                if hasattr(owner, '_graphicsItem'):
+                    gui.removeGraphicsItem(owner._graphicsItem)
         self.entites.clear()
         Entity.entities.clear()
+        commands.clear()
+        snapshots.clear()
+        Component.components.clear()
+        kinematics.clear()
+        for pool in EntityPool.pools:
+            pool.clear()
         Entity.nextEntityId = 0
 
     def registerStarterEntities(self):
@@ -79,26 +123,100 @@ class EntityManager:
     def registerStageEntities(self, stage):
         self.entites['board'] = GameBoard()
         self.entites['player'] = GamePlayer()
+        danPool.preallocate(64, self.entites['player'], 0)
+        danmakuPool.preallocate(1024, 0, 0, 0, 0)
         self.entites['danmaku'] = GameDanmaku()
         self.entites['bgi'] = GameBackground()
         self.entites['hud'] = GameHUD()
+        self.entites['overlay'] = PerformanceOverlay()
         # self.entites['bgi'] = GameBackground()
 
 class WorldRunner(threading.Thread):
-    def __init__(self, world):
+    """
+    固定步长的模拟循环
+
+    经过的真实时间累加到 accumulator，每满 INTERVAL 执行一帧模拟。
+    落后时一次最多追赶 maxCatchUp 帧，只在追赶完后渲染一次；超过上限仍未追上的时间直接丢弃，避免越追越慢。
+    两帧模拟之间每隔 renderInterval 渲染一次，alpha = accumulator / INTERVAL 用于插值绘制。
+    """
+
+    def __init__(self, world, maxCatchUp=MAX_CATCH_UP, renderInterval=None):
         super().__init__()
         self.world = world
+        self.maxCatchUp = maxCatchUp
+        self.renderInterval = renderInterval if renderInterval is not None else world.renderInterval
+        # 统计
+        self.ticks = 0
+        self.frames = 0
+        self.lateTicks = 0
+        self.skippedFrames = 0
+        self.droppedTicks = 0
+        self.startTime = None
+        self.elapsed = 0
 
     def run(self) -> None:
-        count = 0
+        clock = timeit.default_timer
+        self.startTime = previous = lastRender = clock()
+        accumulator = 0
+        interpolating = self.renderInterval < INTERVAL and snapshots.interpolation
         while self.world.running:
-            start = timeit.default_timer()
-            count += 1
-            self.world.nextTick()
-            end = timeit.default_timer()
-            sleepTime = INTERVAL - (end - start)
-            if sleepTime > 0:
-                time.sleep(sleepTime)
+            now = clock()
+            accumulator += now - previous
+            previous = now
+            if accumulator < INTERVAL:
+                wait = INTERVAL - accumulator
+                if interpolating:
+                    sinceRender = now - lastRender
+                    if sinceRender >= self.renderInterval:
+                        self.frames += 1
+                        self.world.render(accumulator / INTERVAL)
+                        lastRender = now
+                        sinceRender = 0
+                    wait = min(wait, self.renderInterval - sinceRender)
+                time.sleep(wait)
+                continue
+            steps = 0
+            while accumulator >= INTERVAL and steps < self.maxCatchUp and self.world.running:
+                start = clock()
+                self.world.step()
+                if clock() - start > INTERVAL:
+                    self.lateTicks += 1
+                accumulator -= INTERVAL
+                steps += 1
+            if steps == 0:
+                # 追赶之前 running 已被清除，没有模拟，不统计也不渲染
+                continue
+            if accumulator >= INTERVAL:
+                dropped = int(accumulator // INTERVAL)
+                self.droppedTicks += dropped
+                accumulator -= dropped * INTERVAL
+            self.ticks += steps
+            # 追赶的帧不渲染
+            self.skippedFrames += steps - 1
+            self.frames += 1
+            self.world.render(accumulator / INTERVAL if interpolating else 1.0)
+            lastRender = clock()
+            self.elapsed = clock() - self.startTime
+
+    @property
+    def rate(self):
+        # 实际的模拟帧率
+        if self.elapsed <= 0:
+            return 0
+        return self.ticks / self.elapsed
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'frames': self.frames,
+            'lateTicks': self.lateTicks,
+            'skippedFrames': self.skippedFrames,
+            'droppedTicks': self.droppedTicks,
+            'rate': self.rate,
+        }
+
+    def format(self):
+        return [ 'runner %5.1f ticks/s  late %d  skip %d  drop %d' % (self.rate, self.lateTicks, self.skippedFrames, self.droppedTicks) ]
 
 
 class World:
@@ -107,44 +225,155 @@ class World:
         super().__init__()
         self.entityManager = EntityManager(self)
         self.systemManager = SystemManager(self)
+        self.collision = None
         self.running = False
+        self.tick = 0
+        self.renderInterval = 1 / RENDER_HZ
+        # 正在预先加载的下一关资源
+        self.preloading = None
+        # 模拟中唯一的随机数来源，每一关开始时用 seed 重新设置
+        self.random = random.Random()
+        self.seed = 0
+        # 录像：recordPath 不为空时记录每一关的输入到 recorder；replay 不为空时由录像驱动 PlayerSys
+        self.recordPath = None
+        self.recorder = None
+        self.replay = None
+        # 确定性校验：hashPath 不为空时每一关由 hasher 记录每帧状态的哈希
+        self.hashPath = None
+        self.hasher = None
 
     def init(self):
         AudioPlayer.load('starter', 'rainbow_world.mp3')
-        AudioPlayer.load('stage-1', 'desire_drive.mp3')
 
     def start(self):
         self.running = True
         self.thread = WorldRunner(self)
         self.thread.start()
 
-    def nextTick(self):
+    def step(self):
+        # 一帧模拟，结束后发布绘制快照
         self.systemManager.nextTick()
+        self.tick += 1
+        if self.hasher is not None:
+            self.hasher.update()
+        if not gui.headless:
+            self.publish()
+
+    def publish(self):
+        snapshot = RenderSnapshot(self.tick)
+        snapshot.destroyed = commands.destroyed
+        for system in self.systemManager.systems:
+            if hasattr(system, 'capture'):
+                system.capture(snapshot)
+        for entity in self.entityManager.entites.values():
+            if hasattr(entity, 'capture'):
+                entity.capture(snapshot)
+        thread = getattr(self, 'thread', None)
+        if profiler.overlay and thread is not None:
+            snapshot.stats += thread.format()
+        snapshots.publish(snapshot)
+
+    def render(self, alpha=1.0):
+        # alpha 为当前时刻在上一帧与当前帧之间的位置
+        snapshots.present(alpha)
         gui.update()
 
+    def nextTick(self):
+        self.step()
+        self.render()
+
     def process(self, type, stage=0):
         if type == 'starter':
             self.running = False
-            if hasattr(self, 'thread') and self.thread is not None:
-                self.thread.join()
+            self.join()
             self.systemManager.cancelSystems()
             self.entityManager.cancelEntities()
             self.entityManager.registerStarterEntities()
             self.systemManager.registerStarterSystems()
         elif type == 'stage':
             self.running = False
+            # 只等待还没有加载完的资源
+            if self.preloading is not None:
+                self.preloading.wait()
+                self.preloading = None
+            self.join()
             self.systemManager.cancelSystems()
             self.entityManager.cancelEntities()
             self.stage(stage)
             self.start()
 
-    def stage(self, stage):
+    def join(self):
+        # 等待模拟线程结束当前帧，在模拟线程中调用时不等待
+        thread = getattr(self, 'thread', None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def stage(self, stage, seed=None):
+        # 回放时使用录像的种子，没有指定时使用新的种子
+        if self.replay is not None:
+            seed = self.replay.seed
+        elif seed is None:
+            seed = int.from_bytes(os.urandom(4), 'little')
+        self.seed = seed
+        self.random.seed(seed)
+        if self.recordPath is not None:
+            self.recorder = InputLog(stage, seed)
+        if self.hashPath is not None:
+            self.hasher = StateHasher(self, stage, seed)
         self.entityManager.registerStageEntities(stage)
         self.systemManager.registerStageSystems(stage)
+        self.tick = 0
+        if not gui.headless:
+            self.publish()
+
+    def setup(self, stage=0, seed=None):
+        # 不启动线程，重新布置关卡，之后由调用方执行 step()
+        self.running = False
+        self.systemManager.cancelSystems()
+        self.entityManager.cancelEntities()
+        self.stage(stage, seed)
+        self.running = True
+
+    def query(self, *types):
+        # 同时拥有这些组件的实体，每行为按参数顺序排列的组件
+        return Component.components.query(*types)
+
+    def system(self, cls):
+        # 取得已注册的系统
+        for system in self.systemManager.systems:
+            if isinstance(system, cls):
+                return system
+        return None
+
+    def simulate(self, ticks, stage=0, seed=None, immortal=False):
+        # 不启动线程、不等待，在当前线程连续执行 ticks 帧；游戏结束时提前返回，immortal 时残机不会用完
+        # 返回 (执行的帧数, 耗时秒数)
+        self.setup(stage, seed)
+        if immortal:
+            self.entityManager.entites['hud'].heartCom.val = 10 ** 9
+        count = 0
+        start = timeit.default_timer()
+        while self.running and count < ticks:
+            self.step()
+            count += 1
+        elapsed = timeit.default_timer() - start
+        self.running = False
+        return count, elapsed
 
     def gameStarter(self):
-        # 标题界面
+        # 标题界面，同时在后台加载第一关的资源
         self.process('starter')
+        self.preload(0)
+
+    def preload(self, stage):
+        stage = loadStage(stage)
+        manifest = stage.assets
+        audios = [ os.path.join('assets', 'audios', audio) for audio in manifest.get('audios', ()) ]
+        self.preloading = assets.preload(manifest.get('images', ()), manifest.get('dirs', ()), audios)
+        # QMediaPlayer 只能在 GUI 线程创建，创建后由 Qt 异步打开音乐
+        if not gui.headless:
+            AudioPlayer.get(loadMusic(stage))
+        return self.preloading
 
     def gameStart(self, stage=0):
         # 重新开始